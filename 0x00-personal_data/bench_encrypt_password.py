@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Benchmark of bcrypt hashing throughput against the number of workers
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+encrypt_password = __import__('encrypt_password')
+hash_password_batch = encrypt_password.hash_password_batch
+
+if __name__ == "__main__":
+    # calibrate first, so that no measure includes it
+    print("cost: {}".format(encrypt_password.get_cost()))
+    cores = os.cpu_count() or 1
+    passwords = ["MyAmazingPassw0rd{}".format(i) for i in range(2 * cores)]
+    workers = 1
+    baseline = None
+    while True:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            start = time.perf_counter()
+            hash_password_batch(passwords, executor)
+            elapsed = time.perf_counter() - start
+        rate = len(passwords) / elapsed
+        baseline = baseline or rate
+        print("{:>3} workers: {:6.2f} hashes/s (x{:.2f})".format(
+            workers, rate, rate / baseline))
+        if workers >= cores:
+            break
+        workers = min(workers * 2, cores)
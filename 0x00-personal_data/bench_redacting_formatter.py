@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Benchmark of RedactingFormatter: free-text records (regex path) against
+mapping records (structured path)
+"""
+import logging
+import timeit
+
+filtered_logger = __import__('filtered_logger')
+
+ROW = {
+    "name": "Marlene Wood", "email": "hwestiii@att.net",
+    "phone": "(473) 401-4253", "ssn": "261-72-6780", "password": "K5?BMNv",
+    "ip": "60ed:c396:2ff:244:bbd0:9208:26f2:93ea",
+    "last_login": "2019-11-14 06:14:24",
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+}
+
+
+def make_record(msg) -> logging.LogRecord:
+    """ Builds a record as logger.info(msg) would """
+    return logging.LogRecord("user_data", logging.INFO, __file__, 0,
+                             msg, None, None)
+
+
+if __name__ == "__main__":
+    formatter = filtered_logger.RedactingFormatter(
+        fields=filtered_logger.PII_FIELDS)
+    text = " ".join("{}={};".format(key, value) for key, value in ROW.items())
+    text_record = make_record(text)
+    dict_record = make_record(ROW)
+    assert formatter.format(text_record).split(": ", 1)[1] == \
+        formatter.format(dict_record).split(": ", 1)[1]
+
+    number = 50000
+    regex = timeit.timeit(lambda: formatter.format(text_record),
+                          number=number)
+    structured = timeit.timeit(lambda: formatter.format(dict_record),
+                               number=number)
+    print("regex path:      {:.2f} us/record".format(regex / number * 1e6))
+    print("structured path: {:.2f} us/record".format(
+        structured / number * 1e6))
+    print("speedup: x{:.2f}".format(regex / structured))
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Checks the behaviour of get_pooled_db against the MySQL server of the
+PERSONAL_DATA_DB_* environment, or with --stand-in against a minimal
+local server speaking just enough of the MySQL protocol (handshake, ping,
+reset, statements answered with OK), which can also drop its connections
+or stop answering
+Usage: ./check_db_pool.py [--stand-in]
+"""
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+filtered_logger = __import__('filtered_logger')
+
+# CLIENT_LONG_PASSWORD | CLIENT_LONG_FLAG | CLIENT_CONNECT_WITH_DB |
+# CLIENT_PROTOCOL_41 | CLIENT_TRANSACTIONS | CLIENT_SECURE_CONNECTION |
+# CLIENT_PLUGIN_AUTH
+CAPABILITIES = 0x1 | 0x4 | 0x8 | 0x200 | 0x2000 | 0x8000 | 0x80000
+COM_QUIT = 0x01
+OK = b"\x00\x00\x00\x02\x00\x00\x00"
+
+
+class StandInServer(threading.Thread):
+    """ Local server accepting any user and password
+        silent: accept connections without ever greeting them
+        drop(): close every open connection
+    """
+
+    def __init__(self):
+        """ Listen on a free local port """
+        super().__init__(daemon=True)
+        self.socket = socket.create_server(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.silent = False
+        self.clients = []
+        self.lock = threading.Lock()
+
+    def run(self):
+        """ Serve every client in its own thread """
+        while True:
+            client, _ = self.socket.accept()
+            with self.lock:
+                self.clients.append(client)
+            if not self.silent:
+                threading.Thread(target=self.serve, args=(client,),
+                                 daemon=True).start()
+
+    def drop(self):
+        """ Close every open connection """
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.close()
+
+    @staticmethod
+    def send(client: socket.socket, sequence: int, payload: bytes):
+        """ Send one packet """
+        header = struct.pack("<I", len(payload))[:3] + bytes([sequence])
+        client.sendall(header + payload)
+
+    @staticmethod
+    def receive(client: socket.socket) -> bytes:
+        """ Receive one packet, b"" once the client is gone """
+        header = client.recv(4, socket.MSG_WAITALL)
+        if len(header) < 4:
+            return b""
+        length = struct.unpack("<I", header[:3] + b"\x00")[0]
+        return client.recv(length, socket.MSG_WAITALL) if length else b"\0"
+
+    def serve(self, client: socket.socket):
+        """ Greet the client, accept its login and answer OK to every
+            command until it quits
+        """
+        salt = os.urandom(20)
+        greeting = (b"\x0a8.0.0-stand-in\x00" + struct.pack("<I", 1) +
+                    salt[:8] + b"\x00" +
+                    struct.pack("<HBHH", CAPABILITIES & 0xffff, 45, 2,
+                                CAPABILITIES >> 16) +
+                    bytes([21]) + bytes(10) + salt[8:] + b"\x00" +
+                    b"mysql_native_password\x00")
+        try:
+            self.send(client, 0, greeting)
+            if self.receive(client):
+                self.send(client, 2, OK)
+            while True:
+                command = self.receive(client)
+                if not command or command[0] == COM_QUIT:
+                    break
+                self.send(client, 1, OK)
+        except OSError:
+            pass
+        finally:
+            client.close()
+
+
+def check(name: str, passed: bool) -> int:
+    """ Print the result of a check, return 1 if it failed """
+    print("{:<48} {}".format(name, "ok" if passed else "FAILED"))
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    server = None
+    if "--stand-in" in sys.argv[1:]:
+        server = StandInServer()
+        server.start()
+        os.environ["PERSONAL_DATA_DB_HOST"] = "127.0.0.1"
+        os.environ["PERSONAL_DATA_DB_PORT"] = str(server.port)
+    os.environ.setdefault("PERSONAL_DATA_DB_POOL_SIZE", "2")
+    os.environ.setdefault("PERSONAL_DATA_DB_POOL_TIMEOUT", "0.5")
+    os.environ.setdefault("PERSONAL_DATA_DB_CONNECT_TIMEOUT", "1")
+    size = int(os.environ["PERSONAL_DATA_DB_POOL_SIZE"])
+    pool_timeout = float(os.environ["PERSONAL_DATA_DB_POOL_TIMEOUT"])
+    connect_timeout = filtered_logger._connect_timeout()
+    failures = 0
+
+    held = [filtered_logger.get_pooled_db() for _ in range(size)]
+    failures += check("borrows {} connections".format(size),
+                      all(db.is_connected() for db in held))
+
+    start = time.monotonic()
+    try:
+        filtered_logger.get_pooled_db().close()
+        waited = None
+    except PoolError:
+        waited = time.monotonic() - start
+    failures += check("exhausted pool waits the pool timeout",
+                      waited is not None and
+                      pool_timeout <= waited < pool_timeout + 0.5)
+
+    threading.Timer(pool_timeout / 2, held.pop().close).start()
+    try:
+        filtered_logger.get_pooled_db().close()
+        passed = True
+    except PoolError:
+        passed = False
+    failures += check("gets a connection released while waiting", passed)
+    for db in held:
+        db.close()
+
+    if server is not None:
+        server.drop()
+        try:
+            db = filtered_logger.get_pooled_db()
+            passed = db.is_connected()
+            db.close()
+        except Error:
+            passed = False
+        failures += check("reconnects after the server dropped it", passed)
+
+        server.silent = True
+        server.drop()
+        start = time.monotonic()
+        try:
+            filtered_logger.get_pooled_db().close()
+            waited = None
+        except Error:
+            waited = time.monotonic() - start
+        failures += check("unanswered connect stops at the connect timeout",
+                          waited is not None and
+                          waited < connect_timeout + 0.5)
+
+    sys.exit(failures)
@@ -1,13 +1,97 @@
 #!/usr/bin/env python3
 """ Password encryption module """
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterable, List, Tuple
 import bcrypt
 
+_executor = None
+_cost = None
+_cost_lock = threading.Lock()
+
+MIN_COST = 4
+MAX_COST = 31
+PROBE_COST = 8
+
+
+def get_executor() -> Executor:
+    """ Returns the shared hashing pool. bcrypt releases the GIL while it
+        works, so threads spread hashes over every core; the size comes
+        from PERSONAL_DATA_HASH_WORKERS (default: CPU count)
+    """
+    global _executor
+    if _executor is None:
+        workers = int(os.getenv('PERSONAL_DATA_HASH_WORKERS',
+                                str(os.cpu_count() or 1)))
+        _executor = ThreadPoolExecutor(max_workers=workers,
+                                       thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _hash_time(cost: int) -> float:
+    """ Seconds taken by one bcrypt hash at the given cost """
+    salt = bcrypt.gensalt(rounds=cost)
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", salt)
+    return time.perf_counter() - start
+
+
+def calibrate_cost(budget_ms: float = None) -> int:
+    """ Measures bcrypt on this machine and caches the highest cost whose
+        hash time stays under budget_ms (default from
+        PERSONAL_DATA_HASH_BUDGET_MS, 250 ms), but never below
+        PERSONAL_DATA_HASH_MIN_COST (default 10). Each cost step doubles
+        the work, so the cost is extrapolated from a cheap probe and then
+        checked once at the chosen value
+    """
+    global _cost
+    if budget_ms is None:
+        budget_ms = float(os.getenv('PERSONAL_DATA_HASH_BUDGET_MS', '250'))
+    budget = budget_ms / 1000
+    floor = max(MIN_COST, int(os.getenv('PERSONAL_DATA_HASH_MIN_COST', '10')))
+    probe = min(_hash_time(PROBE_COST) for _ in range(3))
+    cost = PROBE_COST
+    while cost < MAX_COST and probe * 2 ** (cost + 1 - PROBE_COST) <= budget:
+        cost += 1
+    while cost > MIN_COST and probe * 2 ** (cost - PROBE_COST) > budget:
+        cost -= 1
+    while cost > PROBE_COST and _hash_time(cost) > budget:
+        cost -= 1
+    _cost = max(cost, floor)
+    return _cost
+
+
+def get_cost() -> int:
+    """ Returns the calibrated cost, calibrating on first use (once, even
+        when several threads ask at the same time)
+    """
+    if _cost is None:
+        with _cost_lock:
+            if _cost is None:
+                return calibrate_cost()
+    return _cost
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """ Tells if a hash was made with a lower cost than the calibrated
+        one; callers can then rehash the clear password after a
+        successful is_valid. Stronger hashes are kept as they are
+    """
+    try:
+        cost = int(hashed_password.split(b"$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return True
+    return cost < get_cost()
+
 
 def hash_password(password: str) -> bytes:
     """ Encrypts passwords using the bycrpt package """
     if password is None:
         return None
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=get_cost())
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed
 
@@ -19,3 +103,41 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
         return True
     else:
         return False
+
+
+async def hash_password_async(password: str) -> bytes:
+    """ hash_password run on the hashing pool, without blocking the
+        event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), hash_password,
+                                      password)
+
+
+async def is_valid_async(hashed_password: bytes, password: str) -> bool:
+    """ is_valid run on the hashing pool, without blocking the
+        event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), is_valid,
+                                      hashed_password, password)
+
+
+def hash_password_batch(passwords: Iterable[str],
+                        executor: Executor = None) -> List[bytes]:
+    """ Hashes many passwords in parallel, results in input order """
+    executor = executor or get_executor()
+    return list(executor.map(hash_password, passwords))
+
+
+def is_valid_batch(pairs: Iterable[Tuple[bytes, str]],
+                   executor: Executor = None) -> List[bool]:
+    """ Checks many (hashed_password, password) pairs in parallel,
+        results in input order
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    executor = executor or get_executor()
+    hashes, passwords = zip(*pairs)
+    return list(executor.map(is_valid, hashes, passwords))
@@ -1,23 +1,45 @@
 #!/usr/bin/env python3
 """ filtered_logger.py """
 import re
+import argparse
+import atexit
+import copy
 import logging
+import math
+import queue
 import sys
-from typing import List
+import time
+from functools import lru_cache, partial
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Iterator, List, Mapping, Tuple
 import os
 import mysql.connector
 from mysql.connector.connection import MySQLConnection
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import (MySQLConnectionPool,
+                                     PooledMySQLConnection)
 import bcrypt
 
 
+@lru_cache(maxsize=128)
+def redactor(fields: Tuple[str, ...], redaction: str,
+             separator: str) -> Callable[[str], str]:
+    """ Builds a single-pass redaction function: one alternation pattern
+        for every field, compiled once per field set and separator
+    """
+    alternation = "|".join(re.escape(field) for field in fields)
+    pattern = re.compile(f"({alternation})=[^{re.escape(separator)}]*")
+    suffix = f"={redaction}"
+    return partial(pattern.sub, lambda match: match.group(1) + suffix)
+
+
 def filter_datum(fields: List[str], redaction: str, message: str,
                  separator: str) -> str:
     """ filter_datum returns the log message obfuscated """
-    for field in fields:
-        message = re.sub(f"{field}=[^{separator}]*",
-                         f"{field}={redaction}", message)
-    return message
+    if not fields:
+        return message
+    return redactor(tuple(fields), redaction, separator)(message)
 
 
 PII_FIELDS = ('name', 'email', 'phone', 'password', 'ssn')
@@ -38,29 +60,150 @@ class RedactingFormatter(logging.Formatter):
             self.fields = []
         else:
             self.fields = fields
+        self._field_set = frozenset(self.fields)
+        self._redact = None
+        if self.fields:
+            self._redact = redactor(tuple(self.fields), self.REDACTION,
+                                    self.SEPARATOR)
+
+    def render(self, data: Mapping) -> str:
+        """ Renders a mapping as `key=value;` pairs, masking the PII keys """
+        fields = self._field_set
+        redaction = self.REDACTION
+        separator = self.SEPARATOR
+        return " ".join(
+            f"{key}={redaction if key in fields else value}{separator}"
+            for key, value in data.items())
 
     def format(self, record: List[str]) -> str:
-        """ Formats the logs according to specified criteria """
+        """ Formats the logs according to specified criteria
+            A mapping logged as the message (logger.info({...})) is masked
+            key by key before rendering; free text goes through the regex
+        """
+        if isinstance(record.msg, Mapping):
+            msg, args = record.msg, record.args
+            record.msg, record.args = self.render(msg), None
+            try:
+                return logging.Formatter.format(self, record)
+            finally:
+                record.msg, record.args = msg, args
         format = logging.Formatter.format(self, record)
-        format = filter_datum(self.fields, self.REDACTION,
-                              format, self.SEPARATOR)
+        if self._redact is not None:
+            format = self._redact(format)
         return format
 
 
-def get_logger() -> logging.Logger:
-    """ Returns a Logging.logger object. Serializes PII fields"""
+class DroppingQueueHandler(QueueHandler):
+    """ QueueHandler over a bounded queue: when the queue is full, records
+        are either dropped (and counted) or the caller blocks until the
+        listener catches up
+    """
+
+    def __init__(self, log_queue: queue.Queue, block: bool = False):
+        """ Initialize the handler with its overflow policy """
+        super(DroppingQueueHandler, self).__init__(log_queue)
+        self.block = block
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """ Only merges the message arguments: formatting and redaction
+            are left to the listener thread
+        """
+        record = copy.copy(record)
+        if isinstance(record.msg, Mapping):
+            record.msg = dict(record.msg)
+        else:
+            record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """ Puts the record on the queue according to the policy """
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """ QueueListener whose stop waits for room in a full bounded queue
+        for its stop marker, so that the queued records are still written
+    """
+
+    STOP_TIMEOUT = 5.0
+
+    def stop(self) -> None:
+        """ Writes the queued records then stops the thread; gives up
+            after STOP_TIMEOUT seconds if the thread no longer drains the
+            queue
+        """
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(self._sentinel, timeout=self.STOP_TIMEOUT)
+        except queue.Full:
+            return
+        self._thread.join()
+        self._thread = None
+
+
+_listener = None
+
+
+def _stop_listener() -> None:
+    """ Flushes and stops the background logging thread """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(asynchronous: bool = False, queue_size: int = 10000,
+               block: bool = False) -> logging.Logger:
+    """ Returns a Logging.logger object. Serializes PII fields
+        With asynchronous, records go through a bounded queue of
+        queue_size records and are redacted and written by a background
+        thread; block selects waiting over dropping when the queue is full.
+        Calling it again with the same settings leaves the handlers as
+        they are instead of stacking a new one.
+    """
+    global _listener
     logger = logging.getLogger("user_data")
     logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    if len(logger.handlers) == 1:
+        current = logger.handlers[0]
+        if asynchronous and type(current) is DroppingQueueHandler:
+            if (current.block, current.queue.maxsize) == (block, queue_size):
+                return logger
+        elif not asynchronous and type(current) is logging.StreamHandler:
+            return logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    _stop_listener()
 
     formatter = RedactingFormatter(PII_FIELDS)
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-    logger.propagate = False
+    if not asynchronous:
+        logger.addHandler(stream_handler)
+        return logger
 
+    log_queue = queue.Queue(maxsize=queue_size)
+    _listener = DrainingQueueListener(log_queue, stream_handler,
+                                      respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(DroppingQueueHandler(log_queue, block))
     return logger
 
 
+atexit.register(_stop_listener)
+
+
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """ Connection to a secure MySQL db """
     try:
@@ -78,17 +221,118 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
         print(f"Error While connecting to the db: {e}")
 
 
-def main() -> None:
-    """ Create connection to db and retrieve data from the users table """
+_pool = None
+
+
+def _pool_timeout() -> float:
+    """ Seconds to wait for a free pooled connection """
+    return float(os.getenv('PERSONAL_DATA_DB_POOL_TIMEOUT', '10'))
+
+
+def _connect_timeout() -> int:
+    """ Seconds to wait for the server when opening a connection; the
+        driver takes whole seconds, so fractions are rounded up
+    """
+    timeout = float(os.getenv('PERSONAL_DATA_DB_CONNECT_TIMEOUT', '10'))
+    return max(1, math.ceil(timeout))
+
+
+def get_db_pool() -> MySQLConnectionPool:
+    """ Returns the process wide connection pool, creating it on first use
+        from the PERSONAL_DATA_DB_* environment variables
+    """
+    global _pool
+    if _pool is None:
+        _pool = MySQLConnectionPool(
+            pool_name="personal_data",
+            pool_size=int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE', '5')),
+            host=os.getenv('PERSONAL_DATA_DB_HOST', 'localhost'),
+            port=int(os.getenv('PERSONAL_DATA_DB_PORT', '3306')),
+            user=os.getenv('PERSONAL_DATA_DB_USERNAME', 'root'),
+            password=os.getenv('PERSONAL_DATA_DB_PASSWORD', ''),
+            database=os.getenv('PERSONAL_DATA_DB_NAME'),
+            connection_timeout=_connect_timeout())
+    return _pool
+
+
+def get_pooled_db() -> PooledMySQLConnection:
+    """ Borrows a connection from the pool, waiting up to
+        PERSONAL_DATA_DB_POOL_TIMEOUT seconds for one to be released.
+        The connection is pinged (and reconnected if needed) before being
+        handed out; close() gives it back to the pool.
+        Raises mysql.connector.Error when no healthy connection is available
+    """
+    pool = get_db_pool()
+    deadline = time.monotonic() + _pool_timeout()
+    while True:
+        try:
+            connection = pool.get_connection()
+            break
+        except PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+    try:
+        connection.ping(reconnect=True, attempts=1, delay=0)
+    except Error:
+        connection.close()
+        raise
+    return connection
+
+
+def stream_rows(db: MySQLConnection, columns: List[str] = None,
+                batch_size: int = 1000) -> Iterator[str]:
+    """ Yields each row of the users table formatted as `field=value;`
+        pairs, reading it in fetchmany batches from an unbuffered cursor
+        so that only one batch is held in memory at a time
+    """
+    select = "*"
+    if columns:
+        for column in columns:
+            if not re.fullmatch(r"\w+", column):
+                raise ValueError(f"Invalid column name: {column}")
+        select = ", ".join(f"`{column}`" for column in columns)
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute(f"SELECT {select} FROM users;")
+        fields = cursor.column_names
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield " ".join(f"{field}={value};"
+                               for field, value in zip(fields, row))
+    finally:
+        cursor.close()
+
+
+def main(batch_size: int = 1000, columns: List[str] = None) -> int:
+    """ Create connection to db and log every row of the users table
+        through the RedactingFormatter, then report the throughput
+    """
+    logger = get_logger()
     db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    for row in cursor:
-        if row in PII_FIELDS:
-            print(row)
-    cursor.close()
-    db.close()
+    count = 0
+    start = time.perf_counter()
+    try:
+        for line in stream_rows(db, columns, batch_size):
+            logger.info(line)
+            count += 1
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Exported {count} rows in {elapsed:.2f}s ({rate:.0f} rows/s)",
+          file=sys.stderr)
+    return count
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="rows fetched per round trip")
+    parser.add_argument("--columns", type=lambda s: s.split(","),
+                        help="comma separated columns to export")
+    args = parser.parse_args()
+    main(args.batch_size, args.columns)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+""" redact_csv.py: writes a redacted copy of a CSV dump
+    (shaped like user_data.csv), masking the PII columns
+"""
+import argparse
+import csv
+import io
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Dict, Iterator, List, Tuple
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+
+def read_chunks(reader: Iterator[List[str]],
+                chunk_size: int) -> Iterator[List[List[str]]]:
+    """ Groups the rows of reader in lists of chunk_size rows """
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def line_format(line: str) -> Dict[str, object]:
+    """ csv.writer options rendering rows like the CSV line given: same
+        line terminator, and every field quoted if the line starts with a
+        quote (user_data.csv quotes every data field, not its header)
+    """
+    return {"lineterminator": "\r\n" if line.endswith("\r\n") else "\n",
+            "quoting": csv.QUOTE_ALL if line.startswith('"')
+            else csv.QUOTE_MINIMAL}
+
+
+def redact_chunk(job: Tuple[Tuple[int, ...], str, List[List[str]],
+                            Dict[str, object]]) -> str:
+    """ Masks the given column indexes of every row of a chunk and returns
+        the chunk rendered as CSV text with the given writer options
+    """
+    columns, redaction, rows, options = job
+    out = io.StringIO()
+    writer = csv.writer(out, **options)
+    for row in rows:
+        for column in columns:
+            if column < len(row):
+                row[column] = redaction
+        writer.writerow(row)
+    return out.getvalue()
+
+
+def peak_rss_kb() -> int:
+    """ Peak resident set size of this process plus its largest worker,
+        in KiB
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own + workers
+
+
+def redact_csv(source: io.TextIOBase, target: io.TextIOBase,
+               fields: List[str] = PII_FIELDS,
+               redaction: str = RedactingFormatter.REDACTION,
+               workers: int = None, chunk_size: int = 10000) -> int:
+    """ Streams source to target, masking the fields columns.
+        Chunks of chunk_size rows are redacted by a pool of workers
+        processes and written back in their original order; at most two
+        chunks per worker are in flight at once so memory stays bounded.
+        The header and the rows keep the line terminator and quoting of
+        the source. Returns the number of data rows written
+    """
+    header_line = source.readline()
+    if not header_line:
+        return 0
+    header = next(csv.reader([header_line]))
+    csv.writer(target, **line_format(header_line)).writerow(header)
+    first_line = source.readline()
+    options = line_format(first_line)
+    reader = csv.reader(chain([first_line], source))
+    wanted = set(fields)
+    columns = tuple(i for i, name in enumerate(header) if name in wanted)
+
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk in read_chunks(reader, chunk_size):
+            count += len(chunk)
+            pending.append(executor.submit(redact_chunk,
+                                           (columns, redaction, chunk,
+                                            options)))
+            if len(pending) >= 2 * workers:
+                target.write(pending.popleft().result())
+        while pending:
+            target.write(pending.popleft().result())
+    return count
+
+
+def main() -> None:
+    """ Command line entry point """
+    parser = argparse.ArgumentParser(description=redact_csv.__doc__)
+    parser.add_argument("source", help="CSV file to redact")
+    parser.add_argument("target", nargs="?", default="-",
+                        help="output file (default: stdout)")
+    parser.add_argument("--fields", type=lambda s: s.split(","),
+                        default=list(PII_FIELDS),
+                        help="comma separated columns to mask")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="rows per chunk handed to a worker")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.source, newline='') as source:
+        if args.target == "-":
+            count = redact_csv(source, sys.stdout, args.fields,
+                               workers=args.workers,
+                               chunk_size=args.chunk_size)
+        else:
+            with open(args.target, 'w', newline='') as target:
+                count = redact_csv(source, target, args.fields,
+                                   workers=args.workers,
+                                   chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"Redacted {count} rows in {elapsed:.2f}s ({rate:.0f} rows/s), "
+          f"peak RSS {peak_rss_kb() / 1024:.1f} MiB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
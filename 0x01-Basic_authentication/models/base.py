@@ -1,39 +1,51 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from datetime import datetime, timedelta
+from typing import ContextManager, TypeVar, List, Iterable, Iterator, Tuple
 import uuid
+from models.engine import get_storage
+from models.timestamp import (TIMESTAMP_FORMAT, format_timestamp,
+                              now_timestamp, parse_timestamp)
 
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+FIELDS = {}
+_UNSET = object()
+
+# Storage engine of every model, picked with STORAGE_ENGINE
+storage = get_storage()
 
 
 class Base():
     """ Base class
+        Records are slotted: subclasses list their attributes in
+        __slots__ (or get an instance __dict__ if they don't) and the
+        timestamps are kept as integer microseconds since the epoch
     """
 
+    __slots__ = ('id', '_created_at', '_updated_at', '__weakref__')
+
+    # Secondary indexes: attribute name -> True if values must be unique
+    indexes = {}
+
+    # Callables called with every object saved or removed (caches of
+    # derived data register here)
+    observers = []
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self._created_at = parse_timestamp(kwargs.get('created_at'))
         else:
-            self.created_at = datetime.utcnow()
+            self._created_at = now_timestamp()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self._updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
-            self.updated_at = datetime.utcnow()
+            self._updated_at = now_timestamp()
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -44,11 +56,70 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @property
+    def created_at(self) -> datetime:
+        """ Getter of the creation time
+        """
+        return EPOCH + timedelta(microseconds=self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation time
+        """
+        self._created_at = (value - EPOCH) // MICROSECOND
+
+    @property
+    def version(self) -> int:
+        """ Number changing on every save: the last update time in
+            microseconds
+        """
+        return self._updated_at
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Getter of the last update time
+        """
+        return EPOCH + timedelta(microseconds=self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update time
+        """
+        self._updated_at = (value - EPOCH) // MICROSECOND
+
+    @classmethod
+    def _fields(cls) -> Tuple[Tuple[str, str], ...]:
+        """ (JSON key, slot) of the slotted attributes, base class first
+        """
+        fields = FIELDS.get(cls)
+        if fields is None:
+            names = []
+            for klass in reversed(cls.__mro__):
+                for name in klass.__dict__.get('__slots__', ()):
+                    if name == '__weakref__':
+                        continue
+                    if name in ('_created_at', '_updated_at'):
+                        names.append((name[1:], name))
+                    else:
+                        names.append((name, name))
+            fields = FIELDS[cls] = tuple(names)
+        return fields
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, slot in self._fields():
+            if not for_serialization and key[0] == '_':
+                continue
+            value = getattr(self, slot, _UNSET)
+            if value is _UNSET:
+                continue
+            if key == slot:
+                result[key] = value
+            else:
+                result[key] = format_timestamp(value, for_serialization)
+        for key, value in getattr(self, '__dict__', {}).items():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -59,79 +130,83 @@ class Base():
 
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from the storage engine
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        storage.load(cls)
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects with the storage engine
+        """
+        storage.save_all(cls)
+
+    @staticmethod
+    def flush():
+        """ Write every pending change to disk
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        storage.flush()
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @staticmethod
+    def transaction() -> ContextManager:
+        """ Context manager grouping the saves and removes of the current
+            thread in one write
+        """
+        return storage.transaction()
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        updated_at = self._updated_at
+        self._updated_at = now_timestamp()
+        try:
+            storage.save(self)
+        except Exception:
+            self._updated_at = updated_at
+            raise
+        for observer in Base.observers:
+            observer(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        storage.remove(self)
+        for observer in Base.observers:
+            observer(self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return storage.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
         """ Return all objects
         """
-        return cls.search()
+        return storage.all(cls)
+
+    @classmethod
+    def generation(cls) -> str:
+        """ Token changing whenever an object is saved or removed, None
+            if the storage engine cannot tell
+        """
+        return storage.generation(cls)
+
+    @classmethod
+    def iter_all(cls, after: str = None) -> Iterator[TypeVar('Base')]:
+        """ Iterate over all objects, starting after the object with
+            ID after
+        """
+        return storage.iter_all(cls, after)
 
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return storage.get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return storage.search(cls, attributes)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+""" Storage engines of Base
+
+    STORAGE_ENGINE selects the engine used by every model:
+        file    objects in memory, persisted to .db_<Class>.json (default)
+        sqlite  objects in a SQLite database (STORAGE_SQLITE_PATH)
+"""
+from importlib import import_module
+from os import getenv
+from models.engine.storage import Storage
+
+ENGINES = {
+    'file': ('models.engine.file_storage', 'FileStorage'),
+    'sqlite': ('models.engine.sqlite_storage', 'SQLiteStorage'),
+}
+
+
+def get_storage(name: str = None) -> Storage:
+    """ Create the storage engine called name (STORAGE_ENGINE by default)
+    """
+    name = name or getenv('STORAGE_ENGINE', 'file')
+    if name not in ENGINES:
+        raise ValueError("unknown storage engine {}".format(name))
+    module, class_name = ENGINES[name]
+    return getattr(import_module(module), class_name)()
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+""" File storage engine module
+
+    Objects live in the global DATA dict (class name -> id -> object) and
+    are persisted to .db_<Class>.json (or .db_<Class>.snapshot)
+"""
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from typing import (ContextManager, Iterable, Iterator, List, Tuple,
+                    TypeVar)
+from os import getenv, path
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from models.engine.storage import Storage
+from models.lazy import LazyObjects, line_layout, scan, write_records
+from models.snapshot import SnapshotObjects, write_snapshot
+
+
+DATA = {}
+INDEXES = {}
+INDEXED_VALUES = {}
+
+# Multi-process mode: several processes share the files. Writes (and
+# compactions) hold an exclusive lock on LOCK_FILE and first catch up with
+# the changes of the other processes; reads stat the files and, when they
+# changed, replay only the new journal records (or reload everything after
+# a compaction). Implies the journal mode and disables write-behind
+MULTIPROCESS = getenv('STORAGE_MULTIPROCESS', '0') == '1'
+LOCK_FILE = ".db.lock"
+
+# Journal mode: save/remove append the changed record to .db_<Class>.journal
+# instead of rewriting .db_<Class>.json, which is only rewritten (compacted)
+# once the journal holds JOURNAL_COMPACT_THRESHOLD records
+JOURNAL = getenv('STORAGE_JOURNAL', '0') == '1' or MULTIPROCESS
+JOURNAL_COMPACT_THRESHOLD = int(getenv('STORAGE_JOURNAL_COMPACT', '1000'))
+JOURNAL_LENGTHS = {}
+# (inode, mtime, size) of the files as last read or written by this process
+FILE_STATES = {}
+JOURNAL_STATES = {}
+CLASSES = {}
+
+# Write-behind mode: save/remove only mark the object dirty and return; a
+# background thread persists all pending changes in one batch every
+# FLUSH_INTERVAL seconds, or as soon as FLUSH_THRESHOLD objects are dirty
+WRITE_BEHIND = getenv('STORAGE_WRITE_BEHIND', '0') == '1'
+FLUSH_INTERVAL = float(getenv('STORAGE_FLUSH_INTERVAL', '1'))
+FLUSH_THRESHOLD = int(getenv('STORAGE_FLUSH_THRESHOLD', '100'))
+DIRTY = {}
+
+# Lazy mode: load only indexes the offset of each record, objects are
+# built on first access and kept in a cache of LAZY_CACHE_SIZE objects
+LAZY = getenv('STORAGE_LAZY', '0') == '1'
+LAZY_CACHE_SIZE = int(getenv('STORAGE_LAZY_CACHE', '10000'))
+
+# Snapshot mode: objects are saved to the binary .db_<Class>.snapshot
+# (see models.snapshot) instead of .db_<Class>.json. Loading only maps it
+# in memory: objects are built on first access like in lazy mode and the
+# index lookups run on the snapshot key tables. .db_<Class>.json is still
+# loaded when there is no snapshot yet
+SNAPSHOT = getenv('STORAGE_SNAPSHOT', '0') == '1'
+
+# LOCK guards the in-memory store; FILE_LOCK serializes the writes to disk
+# and is always taken before LOCK
+LOCK = threading.RLock()
+FILE_LOCK = threading.RLock()
+_dirty_full = threading.Condition(LOCK)
+_flusher = None
+# file lock of the multi-process mode: (pid, file, mode, depth)
+_file_lock = None
+# changes of the current thread's transaction: class -> ids
+_transaction = threading.local()
+# saves and removes per class in this process, see generation()
+GENERATIONS = {}
+# insertion order of the ids of each class, for iter_all: class ->
+# [ids, {id: position}]. A removed id leaves None in its place; the order
+# is built again after a reload or once it holds too many of them
+ORDERS = {}
+_process = (None, None)
+
+
+class FileStorage(Storage):
+    """ In-memory storage engine persisted to JSON files
+        Every instance shares the module state
+    """
+
+    def _objects(self, cls: type) -> dict:
+        """ Objects of cls: id -> object
+        """
+        objs = DATA.get(cls.__name__)
+        if objs is None and MULTIPROCESS:
+            # writing without the records of the other processes would
+            # drop them at the next compaction
+            self.load(cls)
+            objs = DATA[cls.__name__]
+        elif objs is None:
+            with LOCK:
+                objs = DATA.get(cls.__name__)
+                if objs is None:
+                    objs = DATA[cls.__name__] = {}
+                    self._reset_indexes(cls)
+        return objs
+
+    @contextmanager
+    def _file_locked(self, shared: bool = False) -> ContextManager:
+        """ Hold the multi-process file lock (exclusive unless shared),
+            catching up with the other processes when taking it
+            The lock is reentrant and only held by one thread at a time
+        """
+        global _file_lock
+        with FILE_LOCK:
+            if _file_lock is not None and _file_lock[0] == os.getpid():
+                pid, f, mode, depth = _file_lock
+                _file_lock = (pid, f, mode, depth + 1)
+                try:
+                    yield
+                finally:
+                    _file_lock = (pid, f, mode, depth)
+                return
+            f = open(LOCK_FILE, 'a')
+            try:
+                mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+                fcntl.flock(f, mode)
+                _file_lock = (os.getpid(), f, mode, 1)
+                for cls in list(CLASSES.values()):
+                    self._sync(cls)
+                yield
+            finally:
+                _file_lock = None
+                f.close()
+
+    def _sync(self, cls: type):
+        """ Catch up with the changes other processes made to the files
+            of cls: replay the new journal records, or reload everything
+            once the file was compacted
+        """
+        s_class = cls.__name__
+        journal = _stat(".db_{}.journal".format(s_class))
+        if _stat(_file_path(s_class)) != FILE_STATES.get(s_class):
+            self._load(cls)
+            return
+        known = JOURNAL_STATES.get(s_class)
+        if journal == known:
+            return
+        if journal is None or known is None or journal[0] != known[0] or \
+                journal[2] < known[2]:
+            self._load(cls)
+            return
+        with LOCK:
+            self._replay_journal(cls, known[2])
+
+    def _refresh(self, cls: type):
+        """ Before a read in multi-process mode: catch up with the other
+            processes if the files of cls changed (two stat calls)
+        """
+        if not MULTIPROCESS:
+            return
+        s_class = cls.__name__
+        self._objects(cls)
+        if _stat(_file_path(s_class)) == FILE_STATES.get(s_class) \
+                and _stat(".db_{}.journal".format(s_class)) == \
+                JOURNAL_STATES.get(s_class):
+            return
+        with self._file_locked(shared=True):
+            self._sync(cls)
+
+    def load(self, cls: type):
+        """ Load the objects of cls, under the shared file lock in
+            multi-process mode
+            Their pending write-behind changes are written first, or the
+            reload would drop them
+        """
+        if not MULTIPROCESS:
+            with FILE_LOCK:
+                self._flush([cls])
+                self._load(cls)
+            return
+        with self._file_locked(shared=True):
+            # taking the lock brought the known classes up to date
+            if CLASSES.get(cls.__name__) is not cls:
+                self._load(cls)
+
+    def _load(self, cls: type):
+        """ Load all objects from file, then replay the journal
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        with LOCK:
+            CLASSES[s_class] = cls
+            _bump(s_class)
+            FILE_STATES[s_class] = _stat(_file_path(s_class))
+            if isinstance(DATA.get(s_class), (LazyObjects, SnapshotObjects)):
+                DATA[s_class].close()
+            DATA[s_class] = {}
+            self._reset_indexes(cls)
+            if FILE_STATES[s_class] is not None and SNAPSHOT:
+                DATA[s_class] = SnapshotObjects(cls, _file_path(s_class),
+                                                LAZY_CACHE_SIZE)
+            elif LAZY and not SNAPSHOT and path.exists(file_path) and \
+                    line_layout(file_path):
+                offsets = {}
+                for obj_id, offset, values in scan(file_path,
+                                                   tuple(cls.indexes)):
+                    offsets[obj_id] = offset
+                    self._index_values(cls, obj_id, values)
+                DATA[s_class] = LazyObjects(cls, file_path, offsets,
+                                            LAZY_CACHE_SIZE)
+            elif path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    objs_json = json.load(f)
+                    for obj_id, obj_json in objs_json.items():
+                        obj = cls(**obj_json)
+                        DATA[s_class][obj_id] = obj
+                        self._index(obj)
+            JOURNAL_LENGTHS[s_class] = 0
+            self._replay_journal(cls)
+
+    def save_all(self, cls: type):
+        """ Save all objects to file
+            The file is replaced atomically and the journal, now folded
+            into it, is dropped
+        """
+        s_class = cls.__name__
+        file_path = _file_path(s_class)
+        lock = self._file_locked() if MULTIPROCESS else FILE_LOCK
+        with lock:
+            records = None
+            with LOCK:
+                objs = self._objects(cls)
+                if SNAPSHOT:
+                    if isinstance(objs, SnapshotObjects):
+                        records = objs.serialized()
+                    else:
+                        records = ((obj_id, json.dumps(obj.to_json(True)))
+                                   for obj_id, obj in objs.items())
+                    write_snapshot(file_path, records, tuple(cls.indexes))
+                    records = None
+                    if isinstance(objs, SnapshotObjects):
+                        objs.rebase(file_path)
+                    else:
+                        DATA[s_class] = SnapshotObjects(cls, file_path,
+                                                        LAZY_CACHE_SIZE)
+                    # the snapshot key tables now index every object
+                    self._reset_indexes(cls)
+                elif isinstance(objs, LazyObjects):
+                    # the new offsets must match the objects held in memory
+                    offsets = write_records(file_path, objs.serialized())
+                    objs.rebase(file_path, offsets)
+                else:
+                    records = [(obj_id, json.dumps(obj.to_json(True)))
+                               for obj_id, obj in objs.items()]
+            if records is not None:
+                write_records(file_path, records)
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                os.remove(journal_path)
+            JOURNAL_LENGTHS[s_class] = 0
+            FILE_STATES[s_class] = _stat(file_path)
+            JOURNAL_STATES[s_class] = None
+
+    def _replay_journal(self, cls: type, offset: int = 0):
+        """ Apply the journal records from offset on top of the loaded
+            objects
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        JOURNAL_STATES[s_class] = None
+        if not path.exists(journal_path):
+            return
+        # readers sharing the lock must not cut what they cannot write
+        writer = _file_lock is None or _file_lock[2] == fcntl.LOCK_EX
+        with open(journal_path, 'rb+') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError(line)
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write at the end of the journal: cut it so the
+                    # next records are appended after the last good one
+                    if writer:
+                        f.truncate(offset)
+                    break
+                offset += len(line)
+                self._apply(cls, record["id"], record["obj"])
+                JOURNAL_LENGTHS[s_class] += 1
+            stat = os.fstat(f.fileno())
+            JOURNAL_STATES[s_class] = (stat.st_ino, stat.st_mtime_ns, offset)
+
+    def _apply(self, cls: type, obj_id: str, obj_json: dict = None):
+        """ Store (or delete, when obj_json is None) one object
+            from its serialized form
+        """
+        objs = self._objects(cls)
+        _bump(cls.__name__)
+        old = objs.get(obj_id)
+        if old is not None:
+            self._unindex(old)
+        if obj_json is None:
+            objs.pop(obj_id, None)
+            _order_remove(cls.__name__, obj_id)
+            return
+        obj = cls(**obj_json)
+        objs[obj_id] = obj
+        _order_add(cls.__name__, obj_id)
+        self._index(obj)
+
+    def _journal(self, cls: type, obj_ids: Iterable[str]):
+        """ Append the current state of objects (null once removed) to the
+            journal in one write, compacting it past the threshold
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        with FILE_LOCK:
+            with LOCK:
+                objs = self._objects(cls)
+                lines = []
+                for obj_id in obj_ids:
+                    obj = objs.get(obj_id)
+                    obj_json = obj.to_json(True) if obj is not None else None
+                    lines.append(json.dumps({"id": obj_id, "obj": obj_json}))
+            with open(journal_path, 'a') as f:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                stat = os.fstat(f.fileno())
+                JOURNAL_STATES[s_class] = (stat.st_ino, stat.st_mtime_ns,
+                                           stat.st_size)
+            length = JOURNAL_LENGTHS.get(s_class, 0) + len(lines)
+            JOURNAL_LENGTHS[s_class] = length
+            if length >= JOURNAL_COMPACT_THRESHOLD:
+                self.save_all(cls)
+
+    def _write(self, cls: type, obj_ids: Iterable[str]):
+        """ Write saved or removed objects to disk
+        """
+        if JOURNAL:
+            self._journal(cls, obj_ids)
+        else:
+            self.save_all(cls)
+
+    def _persist(self, cls: type, obj_ids: Iterable[str]):
+        """ Persist saved or removed objects, now, at the end of the
+            current transaction or (write-behind) with the next batch
+        """
+        pending = getattr(_transaction, 'pending', None)
+        if pending is not None:
+            pending.setdefault(cls, set()).update(obj_ids)
+            return
+        if not WRITE_BEHIND or MULTIPROCESS:
+            self._write(cls, obj_ids)
+            return
+        with LOCK:
+            DIRTY.setdefault(cls, set()).update(obj_ids)
+            if sum(len(ids) for ids in DIRTY.values()) >= FLUSH_THRESHOLD:
+                _dirty_full.notify()
+        _start_flusher()
+
+    def flush(self):
+        """ Write every pending write-behind change to disk
+            Changes whose write fails are pending again for the next flush
+        """
+        self._flush()
+
+    def _flush(self, classes: Iterable[type] = None):
+        """ flush() limited to the changes of classes if given
+            FILE_LOCK is held from taking the changes to writing them, so
+            no load happens in between
+        """
+        with FILE_LOCK:
+            with LOCK:
+                if classes is None:
+                    pending = list(DIRTY.items())
+                    DIRTY.clear()
+                else:
+                    pending = [(cls, DIRTY.pop(cls)) for cls in classes
+                               if cls in DIRTY]
+            for i, (cls, obj_ids) in enumerate(pending):
+                try:
+                    self._write(cls, obj_ids)
+                except BaseException:
+                    with LOCK:
+                        for cls, obj_ids in pending[i:]:
+                            DIRTY.setdefault(cls, set()).update(obj_ids)
+                    raise
+
+    @contextmanager
+    def transaction(self) -> ContextManager:
+        """ Persist the changes of the current thread once, on exit
+            The store is locked until then, so what the transaction reads
+            stays true while it writes (there is no rollback)
+            Nested transactions join the outer one
+        """
+        if getattr(_transaction, 'pending', None) is not None:
+            yield
+            return
+        with self._file_locked() if MULTIPROCESS else FILE_LOCK, LOCK:
+            _transaction.pending = {}
+            try:
+                yield
+            finally:
+                pending = _transaction.pending
+                _transaction.pending = None
+                for cls, obj_ids in pending.items():
+                    self._persist(cls, obj_ids)
+
+    def _reset_indexes(self, cls: type):
+        """ Empty the secondary indexes of the class
+        """
+        s_class = cls.__name__
+        INDEXES[s_class] = {attr: {} for attr in cls.indexes}
+        INDEXED_VALUES[s_class] = {}
+        ORDERS.pop(s_class, None)
+
+    def _index(self, obj: TypeVar('Base')):
+        """ Add an object to the secondary indexes
+        """
+        values = tuple(getattr(obj, attr, None) for attr in obj.indexes)
+        self._index_values(obj.__class__, obj.id, values)
+
+    def _index_values(self, cls: type, obj_id: str, values: tuple):
+        """ Add the indexed values of an object (in the order of
+            cls.indexes) to the secondary indexes. An index entry holds
+            the id itself, or a set once several objects share the value
+        """
+        s_class = cls.__name__
+        for attr, value in zip(cls.indexes, values):
+            index = INDEXES[s_class][attr]
+            ids = index.get(value)
+            if ids is None:
+                index[value] = obj_id
+            elif type(ids) is set:
+                ids.add(obj_id)
+            elif ids != obj_id:
+                index[value] = {ids, obj_id}
+        INDEXED_VALUES[s_class][obj_id] = values
+
+    def _unindex(self, obj: TypeVar('Base')):
+        """ Remove an object from the secondary indexes
+        """
+        s_class = obj.__class__.__name__
+        values = INDEXED_VALUES[s_class].pop(obj.id, ())
+        for attr, value in zip(obj.indexes, values):
+            index = INDEXES[s_class][attr]
+            ids = index.get(value)
+            if ids == obj.id:
+                del index[value]
+            elif type(ids) is set:
+                ids.discard(obj.id)
+                if len(ids) == 1:
+                    index[value] = ids.pop()
+
+    def _indexed_ids(self, cls: type, attr: str, value) -> Iterable[str]:
+        """ Ids of the objects whose indexed attr equals value
+        """
+        ids = INDEXES[cls.__name__][attr].get(value, ())
+        ids = (ids,) if type(ids) is str else ids
+        objs = DATA.get(cls.__name__)
+        if isinstance(objs, SnapshotObjects):
+            ids = list(ids) + objs.snapshot_ids(attr, value)
+        return ids
+
+    def _check_unique(self, obj: TypeVar('Base')):
+        """ Raise ValueError if a unique attribute is already used
+            The indexed attributes of a stored object then get back their
+            saved values: obj may be the very object the store holds, which
+            must keep matching its index entries
+        """
+        cls = obj.__class__
+        saved = INDEXED_VALUES[cls.__name__].get(obj.id)
+        for i, (attr, unique) in enumerate(obj.indexes.items()):
+            value = getattr(obj, attr, None)
+            if not unique or value is None or \
+                    (saved is not None and saved[i] == value):
+                continue
+            ids = self._indexed_ids(cls, attr, value)
+            if len(ids) > 1 or (len(ids) == 1 and obj.id not in ids):
+                if saved is not None:
+                    for name, saved_value in zip(obj.indexes, saved):
+                        setattr(obj, name, saved_value)
+                raise ValueError("{} {} already exists".format(attr, value))
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store an object
+        """
+        with self._file_locked() if MULTIPROCESS else nullcontext():
+            with LOCK:
+                objs = self._objects(obj.__class__)
+                self._check_unique(obj)
+                _bump(obj.__class__.__name__)
+                objs[obj.id] = obj
+                _order_add(obj.__class__.__name__, obj.id)
+                self._unindex(obj)
+                self._index(obj)
+            self._persist(obj.__class__, [obj.id])
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete an object
+        """
+        with self._file_locked() if MULTIPROCESS else nullcontext():
+            with LOCK:
+                objs = self._objects(obj.__class__)
+                if objs.get(obj.id) is None:
+                    return
+                _bump(obj.__class__.__name__)
+                del objs[obj.id]
+                _order_remove(obj.__class__.__name__, obj.id)
+                self._unindex(obj)
+            self._persist(obj.__class__, [obj.id])
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        self._refresh(cls)
+        return len(self._objects(cls))
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with id obj_id, or None
+        """
+        self._refresh(cls)
+        return self._objects(cls).get(obj_id)
+
+    def iter_all(self, cls: type, after: str = None
+                 ) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects of cls in insertion order, starting
+            after the object with id after (nothing if there is none)
+            The position of after comes from ORDERS, so a page costs what
+            it holds; objects are only built when reached, the ones removed
+            in the meantime are skipped and the ones added are not reached
+        """
+        self._refresh(cls)
+        s_class = cls.__name__
+        objs = self._objects(cls)
+        with LOCK:
+            order = ORDERS.get(s_class)
+            if order is None:
+                ids = list(objs)
+                order = ORDERS[s_class] = [ids, {obj_id: i for i, obj_id
+                                                 in enumerate(ids)}]
+            ids, end = order[0], len(order[0])
+            start = 0
+            if after is not None:
+                start = order[1].get(after)
+                if start is None:
+                    return
+                start += 1
+        for obj_id in islice(ids, start, end):
+            if obj_id is None:
+                continue
+            obj = objs.get(obj_id)
+            if obj is not None:
+                yield obj
+
+    def generation(self, cls: type) -> str:
+        """ Token of the current state of the objects of cls
+            In multi-process mode every process holds what the files hold,
+            so their state is the token; otherwise it counts the changes
+            made by this process, whose run is told apart by a random id
+        """
+        global _process
+        self._refresh(cls)
+        self._objects(cls)
+        s_class = cls.__name__
+        if MULTIPROCESS:
+            return "{}-{}".format(FILE_STATES.get(s_class),
+                                  JOURNAL_STATES.get(s_class))
+        if _process[0] != os.getpid():
+            _process = (os.getpid(), uuid.uuid4().hex)
+        return "{}-{}".format(_process[1], GENERATIONS.get(s_class, 0))
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects of cls matching all attributes
+            Uses a secondary index when one of the attributes has one
+            The candidates are collected under LOCK: a save or remove in
+            another thread could otherwise swap the snapshot or drop an id
+            while they are read
+        """
+        def _search(obj):
+            if len(attributes) == 0:
+                return True
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        self._refresh(cls)
+        objs = self._objects(cls)
+        with LOCK:
+            candidates = None
+            for k, v in attributes.items():
+                if k not in INDEXES[cls.__name__]:
+                    continue
+                try:
+                    ids = self._indexed_ids(cls, k, v)
+                except TypeError:
+                    continue
+                candidates = [objs[obj_id] for obj_id in ids]
+                break
+            if candidates is None:
+                candidates = list(objs.values())
+        return list(filter(_search, candidates))
+
+
+def _bump(s_class: str):
+    """ Count a change of the objects of a class, see generation()
+    """
+    GENERATIONS[s_class] = GENERATIONS.get(s_class, 0) + 1
+
+
+def _order_add(s_class: str, obj_id: str):
+    """ Append a new id to the order of its class, if built
+    """
+    order = ORDERS.get(s_class)
+    if order is not None and obj_id not in order[1]:
+        order[1][obj_id] = len(order[0])
+        order[0].append(obj_id)
+
+
+def _order_remove(s_class: str, obj_id: str):
+    """ Take a removed id out of the order of its class, if built
+    """
+    order = ORDERS.get(s_class)
+    if order is not None and obj_id in order[1]:
+        order[0][order[1].pop(obj_id)] = None
+        if len(order[0]) > 2 * len(order[1]) + 64:
+            del ORDERS[s_class]
+
+
+def _file_path(s_class: str) -> str:
+    """ File the objects of a class are saved to
+    """
+    return ".db_{}.{}".format(s_class, "snapshot" if SNAPSHOT else "json")
+
+
+def _stat(file_path: str) -> Tuple[int, int, int]:
+    """ (inode, mtime, size) of a file, None if it does not exist
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _flush_loop():
+    """ Background flusher of the write-behind mode
+        A failed flush is logged and retried after FLUSH_INTERVAL
+    """
+    while True:
+        with LOCK:
+            _dirty_full.wait(FLUSH_INTERVAL)
+        try:
+            FileStorage().flush()
+        except Exception:
+            logging.getLogger(__name__).exception(
+                "write-behind flush failed, retrying")
+            time.sleep(FLUSH_INTERVAL)
+
+
+def _start_flusher():
+    """ Start the write-behind flusher thread once
+    """
+    global _flusher
+    if _flusher is None:
+        with LOCK:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, daemon=True,
+                                            name="base-flusher")
+                _flusher.start()
+
+
+atexit.register(FileStorage().flush)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+""" Timestamp codec module
+
+    Fast path for TIMESTAMP_FORMAT ("%Y-%m-%dT%H:%M:%S") timestamps held
+    as integer microseconds since the epoch: the date part of the text is
+    cached, so parsing and formatting only do integer arithmetic for the
+    time of day. Stored timestamps keep the microseconds in a ".ffffff"
+    suffix
+"""
+from datetime import date, datetime
+from functools import lru_cache
+import time
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _days(text: str) -> int:
+    """ Days since the epoch of a YYYY-MM-DD date
+    """
+    return date.fromisoformat(text).toordinal() - EPOCH_ORDINAL
+
+
+@lru_cache(maxsize=4096)
+def _date_text(days: int) -> str:
+    """ YYYY-MM-DD date of a number of days since the epoch
+    """
+    return date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+
+
+def now_timestamp() -> int:
+    """ Current UTC time in microseconds since the epoch
+    """
+    return time.time_ns() // 1000
+
+
+def parse_timestamp(text: str) -> int:
+    """ Microseconds since the epoch of a TIMESTAMP_FORMAT string,
+        optionally followed by ".ffffff" microseconds
+    """
+    micros = 0
+    if len(text) == 26 and text[19] == "." and text[20:].isdecimal():
+        micros = int(text[20:])
+        text = text[:19]
+    if len(text) == 19 and text[4] == text[7] == "-" and text[10] == "T" \
+            and text[13] == text[16] == ":" and \
+            (text[:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] +
+             text[17:19]).isdecimal():
+        hours, minutes = int(text[11:13]), int(text[14:16])
+        seconds = int(text[17:19])
+        if hours < 24 and minutes < 60 and seconds < 60:
+            try:
+                days = _days(text[:10])
+            except ValueError:
+                days = None
+            if days is not None:
+                return (days * 86400 + hours * 3600 + minutes * 60 +
+                        seconds) * 1000000 + micros
+    # anything unusual goes through strptime, which raises the ValueError
+    parsed = datetime.strptime(text, TIMESTAMP_FORMAT)
+    return ((parsed.toordinal() - EPOCH_ORDINAL) * 86400 + parsed.hour * 3600 +
+            parsed.minute * 60 + parsed.second) * 1000000 + micros
+
+
+@lru_cache(maxsize=4096)
+def _format_seconds(seconds: int) -> str:
+    """ TIMESTAMP_FORMAT string of a number of seconds since the epoch
+    """
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return "{}T{:02d}:{:02d}:{:02d}".format(_date_text(days), hours,
+                                            minutes, seconds)
+
+
+def format_timestamp(micros: int, precise: bool = False) -> str:
+    """ TIMESTAMP_FORMAT string of microseconds since the epoch, with the
+        ".ffffff" microseconds if precise
+    """
+    seconds, micros = divmod(micros, 1000000)
+    if precise:
+        return "{}.{:06d}".format(_format_seconds(seconds), micros)
+    return _format_seconds(seconds)
@@ -7,7 +7,7 @@ from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import CORS
 import os
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, PathMatcher
 from api.v1.auth.basic_auth import BasicAuth
 from api.v1.auth.session_auth import SessionAuth
 
@@ -26,6 +26,14 @@ elif AUTH_TYPE == 'basic_auth':
 elif AUTH_TYPE == 'auth':
     auth = Auth()
 
+# paths served without authentication, compiled once
+EXCLUDED_PATHS = PathMatcher([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'
+])
+
 
 @app.errorhandler(401)
 def unauthorized(error):
@@ -69,13 +77,7 @@ def before_request():
        error 403 - you must use abort
     """
     if auth:
-        excluded_paths = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-            '/api/v1/auth_session/login/'
-        ]
-        if not auth.require_auth(request.path, excluded_paths):
+        if not auth.require_auth(request.path, EXCLUDED_PATHS):
             return
         authorization = auth.authorization_header(request)
         session = auth.session_cookie(request)
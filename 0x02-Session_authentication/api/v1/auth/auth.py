@@ -2,10 +2,68 @@
 """Module Auth"""
 
 import re
-from typing import List, TypeVar
+from typing import Iterable, List, TypeVar
 from flask import request
 import os
 
+# name of the session cookie, read once at startup
+SESSION_NAME = os.getenv('SESSION_NAME')
+
+
+class PathMatcher:
+    """ Compiled list of excluded paths, matched in O(path length)
+        Like the patterns of Auth.require_auth: a trailing slash is
+        optional and a trailing * matches any end of path. Exact
+        patterns go in a set, and the prefixes of the * ones in a trie
+        turned into one regular expression, whose alternatives at every
+        position start with distinct characters
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """ Compile patterns
+        """
+        self.patterns = list(patterns)
+        self.exact = set()
+        trie = {}
+        for pattern in self.patterns:
+            if pattern.endswith("/"):
+                pattern = pattern[:-1]
+            self.exact.add(pattern)
+            if pattern.endswith("*"):
+                node = trie
+                for c in pattern[:-1]:
+                    node = node.setdefault(c, {})
+                node[None] = True
+        self.prefix = re.compile(self._regex(trie)) if trie else None
+
+    @classmethod
+    def _regex(cls, node: dict) -> str:
+        """ Regular expression matching the prefixes of a trie node
+            (a shorter prefix makes the longer ones useless)
+        """
+        if None in node:
+            return ""
+        branches = [re.escape(c) + cls._regex(child)
+                    for c, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:{})".format("|".join(branches))
+
+    def __len__(self) -> int:
+        """ Number of patterns
+        """
+        return len(self.patterns)
+
+    def match(self, path: str) -> bool:
+        """ Tell if path is excluded
+        """
+        if path.endswith("/"):
+            path = path[:-1]
+        if path in self.exact:
+            return True
+        return self.prefix is not None and \
+            self.prefix.match(path) is not None
+
 
 class Auth:
     """Auth class"""
@@ -30,9 +88,14 @@ class Auth:
             /api/v1/users will return True
             /api/v1/status will return False
             /api/v1/stats will return False
+        Note:
+            excluded_paths may be a PathMatcher built once, matched in
+            O(path length); a list is scanned pattern by pattern
         """
         if path is None or excluded_paths is None or len(excluded_paths) == 0:
             return True
+        if isinstance(excluded_paths, PathMatcher):
+            return not excluded_paths.match(path)
         if path[-1] == "/":
             path = path[:-1]
         for path_excluded in excluded_paths:
@@ -82,5 +145,4 @@ class Auth:
         """
         if request is None:
             return None
-        session_name = os.getenv('SESSION_NAME')
-        return request.cookies.get(session_name)
+        return request.cookies.get(SESSION_NAME)
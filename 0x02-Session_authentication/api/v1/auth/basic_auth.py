@@ -3,12 +3,29 @@
 
 import base64
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import SessionStore
 from typing import TypeVar
 from models.user import User
+from os import getenv, urandom
+import hashlib
+
+# seconds a verified Authorization header is trusted without checking
+# its password again (0: never)
+CACHE_TTL = float(getenv('BASIC_AUTH_CACHE_TTL', '10'))
+CACHE_SIZE = int(getenv('BASIC_AUTH_CACHE_SIZE', '10000'))
+# key of the hash of the headers, so that no credentials are kept
+_CACHE_KEY = urandom(32)
 
 
 class BasicAuth(Auth):
-    """BasicAuth class that inherits from Auth"""
+    """BasicAuth class that inherits from Auth
+        Verified headers are cached by their keyed hash, with the user
+        they resolved to and its email and password hash: a cached header
+        stops matching as soon as its user changes either or is removed
+    """
+    # keyed hash of a header -> (user ID, email, password hash)
+    verified = SessionStore(CACHE_TTL, CACHE_SIZE, False)
+
     def extract_base64_authorization_header(
         self, authorization_header: str
     ) -> str:
@@ -132,6 +149,17 @@ class BasicAuth(Auth):
         authorization_header = self.authorization_header(request)
         if not authorization_header:
             return None
+        if CACHE_TTL > 0:
+            key = hashlib.blake2b(authorization_header.encode(),
+                                  key=_CACHE_KEY, digest_size=16).digest()
+            cached = self.verified.get(key)
+            if cached is not None:
+                user_id, email, password = cached
+                user = User.get(user_id)
+                if user is not None and user.email == email and \
+                        user.password == password:
+                    return user
+                self.verified.pop(key, None)
         base64_authorization_header = (
             self.extract_base64_authorization_header(authorization_header)
         )
@@ -147,4 +175,7 @@ class BasicAuth(Auth):
         user_email, user_pwd = self.extract_user_credentials(user_credentials)
         if not user_email or not user_pwd:
             return None
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None and CACHE_TTL > 0:
+            self.verified[key] = (user.id, user.email, user.password)
+        return user
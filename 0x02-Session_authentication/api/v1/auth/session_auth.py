@@ -2,13 +2,34 @@
 """Module for session Auth"""
 
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_store import SessionStore, get_session_store
+from collections import OrderedDict
+from models.base import Base
 from models.user import User
+from os import getenv
+import threading
+import time
 import uuid
 
+# seconds the user of a session is reused without loading it again (0:
+# never); a change of the user made by another process is noticed after
+# that delay at most. The session itself is checked on every request
+USER_CACHE_TTL = float(getenv('SESSION_USER_CACHE_TTL', '1'))
+USER_CACHE_SIZE = int(getenv('SESSION_USER_CACHE_SIZE', '10000'))
+
 
 class SessionAuth(Auth):
-    """Session Auth class"""
-    user_id_by_session_id = {}
+    """Session Auth class
+        Sessions expire and are bounded in number, in the store selected
+        by SESSION_BACKEND: see api.v1.auth.session_store
+    """
+    user_id_by_session_id = get_session_store()
+    # session ID -> (User, monotonic time it was resolved)
+    user_by_session_id = SessionStore(USER_CACHE_TTL, USER_CACHE_SIZE, False)
+    # user ID -> monotonic time of its last save or remove, kept for
+    # USER_CACHE_TTL: older changes predate every cached user
+    _user_changes = OrderedDict()
+    _user_changes_lock = threading.Lock()
 
     def create_session(self, user_id: str = None) -> str:
         """Creates a Session ID for a user_id:
@@ -60,10 +81,23 @@ class SessionAuth(Auth):
         session_id = self.session_cookie(request)
         if session_id is None:
             return None
+        resolved = time.monotonic()
         user_id = self.user_id_for_session_id(session_id)
         if user_id is None:
+            self.user_by_session_id.pop(session_id, None)
             return None
-        return User.get(user_id)
+        if USER_CACHE_TTL > 0:
+            cached = self.user_by_session_id.get(session_id)
+            if cached is not None:
+                user, cached_at = cached
+                changed = self._user_changes.get(user.id)
+                if user.id == user_id and \
+                        (changed is None or changed < cached_at):
+                    return user
+        user = User.get(user_id)
+        if user is not None and USER_CACHE_TTL > 0:
+            self.user_by_session_id[session_id] = (user, resolved)
+        return user
 
     def destroy_session(self, request=None):
         """Deletes the user session / logout
@@ -88,4 +122,23 @@ class SessionAuth(Auth):
             del self.user_id_by_session_id[session_id]
         except Exception as e:
             pass
+        self.user_by_session_id.pop(session_id, None)
         return True
+
+    @classmethod
+    def user_changed(cls, obj: Base):
+        """ Observer of the saves and removes of Base: the cached users
+            resolved before a change of their user are not reused
+        """
+        if not isinstance(obj, User):
+            return
+        now = time.monotonic()
+        with cls._user_changes_lock:
+            changes = cls._user_changes
+            changes[obj.id] = now
+            changes.move_to_end(obj.id)
+            while next(iter(changes.values())) < now - USER_CACHE_TTL:
+                changes.popitem(last=False)
+
+
+Base.observers.append(SessionAuth.user_changed)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+""" Session store module
+
+    A bounded mapping of session IDs to user IDs: sessions expire after
+    SESSION_DURATION seconds (0: never), counted from their creation or,
+    with SESSION_SLIDING=1, from their last use. Past SESSION_MAX_COUNT
+    sessions, the least recently used one is evicted
+
+    SESSION_BACKEND selects where SessionAuth keeps its sessions:
+        memory  in the process (default)
+        sqlite  in a SQLite database shared by every process
+                (SESSION_SQLITE_PATH)
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from importlib import import_module
+from os import getenv
+from typing import Iterator, Tuple
+import threading
+import time
+
+DURATION = float(getenv('SESSION_DURATION', '0'))
+MAX_COUNT = int(getenv('SESSION_MAX_COUNT', '100000'))
+SLIDING = getenv('SESSION_SLIDING', '0') == '1'
+# expiry entries the sweeper looks at per write
+SWEEP_SLICE = 16
+
+BACKENDS = {
+    'memory': ('api.v1.auth.session_store', 'SessionStore'),
+    'sqlite': ('api.v1.auth.sqlite_session_store', 'SQLiteSessionStore'),
+}
+
+
+class ExpiryHeap():
+    """ Min-heap of (expiry time, session ID) holding at most one entry
+        per session: the entry of a session is moved or removed in
+        O(log n), so the heap never fills up with stale entries
+    """
+
+    def __init__(self):
+        """ Initialize an empty heap
+        """
+        self._entries = []
+        # session ID -> index of its entry
+        self._positions = {}
+
+    def __len__(self) -> int:
+        """ Number of entries
+        """
+        return len(self._entries)
+
+    def first(self) -> Tuple[float, str]:
+        """ Entry expiring first, None if there is none
+        """
+        return self._entries[0] if self._entries else None
+
+    def set(self, session_id: str, expiry: float):
+        """ Add the entry of a session, or move it to expiry
+        """
+        position = self._positions.get(session_id)
+        if position is None:
+            position = len(self._entries)
+            self._entries.append((expiry, session_id))
+            self._positions[session_id] = position
+        else:
+            self._entries[position] = (expiry, session_id)
+        self._down(self._up(position))
+
+    def discard(self, session_id: str):
+        """ Remove the entry of a session, if any
+        """
+        position = self._positions.pop(session_id, None)
+        if position is None:
+            return
+        last = self._entries.pop()
+        if position < len(self._entries):
+            self._entries[position] = last
+            self._positions[last[1]] = position
+            self._down(self._up(position))
+
+    def _swap(self, i: int, j: int):
+        """ Swap two entries
+        """
+        entries = self._entries
+        entries[i], entries[j] = entries[j], entries[i]
+        self._positions[entries[i][1]] = i
+        self._positions[entries[j][1]] = j
+
+    def _up(self, position: int) -> int:
+        """ Move an entry up to its place, return its new index
+        """
+        while position > 0:
+            parent = (position - 1) // 2
+            if self._entries[parent] <= self._entries[position]:
+                break
+            self._swap(position, parent)
+            position = parent
+        return position
+
+    def _down(self, position: int):
+        """ Move an entry down to its place
+        """
+        count = len(self._entries)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < count and \
+                        self._entries[child] < self._entries[smallest]:
+                    smallest = child
+            if smallest == position:
+                return
+            self._swap(position, smallest)
+            position = smallest
+
+
+class SessionStore(MutableMapping):
+    """ Mapping of session IDs to user IDs with expiry and LRU eviction
+        Expired sessions are dropped when they are read, and by a sweeper
+        that every read and write runs on at most SWEEP_SLICE sessions,
+        so no request ever scans the whole store
+    """
+
+    def __init__(self, duration: float = None, max_count: int = None,
+                 sliding: bool = None):
+        """ Initialize an empty store (defaults from the environment)
+        """
+        self.duration = DURATION if duration is None else duration
+        self.max_count = MAX_COUNT if max_count is None else max_count
+        self.sliding = SLIDING if sliding is None else sliding
+        # session ID -> [user ID, expiry time or None, duration], least
+        # recently used first
+        self._sessions = OrderedDict()
+        # expiry of every expiring session; with sliding sessions an entry
+        # can be earlier than the session, it is moved when it comes out
+        self._expiries = ExpiryHeap()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def set(self, session_id: str, user_id: str, duration: float = None):
+        """ Store a session lasting duration seconds (default: the
+            duration of the store, 0 for no expiry)
+        """
+        duration = self.duration if duration is None else duration
+        expiry = time.monotonic() + duration if duration > 0 else None
+        with self._lock:
+            self._sessions[session_id] = [user_id, expiry, duration]
+            self._sessions.move_to_end(session_id)
+            if expiry is not None:
+                self._expiries.set(session_id, expiry)
+            else:
+                self._expiries.discard(session_id)
+            while len(self._sessions) > self.max_count:
+                evicted, _ = self._sessions.popitem(last=False)
+                self._expiries.discard(evicted)
+                self.evictions += 1
+            self._sweep(SWEEP_SLICE)
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """ Store a session with the duration of the store
+        """
+        self.set(session_id, user_id)
+
+    def __getitem__(self, session_id: str) -> str:
+        """ User ID of a live session, which becomes the most recently
+            used (and, when sliding, gets a new expiry)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(SWEEP_SLICE)
+            session = self._sessions[session_id]
+            if session[1] is not None and session[1] <= now:
+                del self._sessions[session_id]
+                self._expiries.discard(session_id)
+                self.expirations += 1
+                raise KeyError(session_id)
+            self._sessions.move_to_end(session_id)
+            if self.sliding and session[1] is not None:
+                session[1] = now + session[2]
+            return session[0]
+
+    def __delitem__(self, session_id: str):
+        """ Remove a session
+        """
+        with self._lock:
+            del self._sessions[session_id]
+            self._expiries.discard(session_id)
+
+    def __iter__(self) -> Iterator[str]:
+        """ IDs of the sessions, least recently used first (expired ones
+            not swept yet included)
+        """
+        with self._lock:
+            return iter(list(self._sessions))
+
+    def __len__(self) -> int:
+        """ Number of sessions, expired ones not swept yet included
+        """
+        return len(self._sessions)
+
+    def sweep(self, limit: int = SWEEP_SLICE) -> int:
+        """ Drop expired sessions, looking at most at limit of them (all of
+            them if limit is None)
+            Return the number dropped
+        """
+        with self._lock:
+            return self._sweep(limit)
+
+    def _sweep(self, limit: int) -> int:
+        """ sweep() with the lock held
+        """
+        now = time.monotonic()
+        dropped = 0
+        expiries = self._expiries
+        while limit is None or limit > 0:
+            first = expiries.first()
+            if first is None or first[0] > now:
+                break
+            if limit is not None:
+                limit -= 1
+            session_id = first[1]
+            session = self._sessions[session_id]
+            if session[1] > now:
+                # used since (sliding): expires later
+                expiries.set(session_id, session[1])
+                continue
+            del self._sessions[session_id]
+            expiries.discard(session_id)
+            self.expirations += 1
+            dropped += 1
+        return dropped
+
+    def __repr__(self) -> str:
+        """ The sessions as a dict: {session ID: user ID}
+        """
+        with self._lock:
+            return repr({session_id: session[0] for session_id, session
+                         in self._sessions.items()})
+
+    def stats(self) -> dict:
+        """ Counters of the store, once every expired session is dropped
+            so that 'active' only counts live ones
+        """
+        with self._lock:
+            self._sweep(None)
+            return {'active': len(self._sessions),
+                    'evictions': self.evictions,
+                    'expirations': self.expirations}
+
+
+def get_session_store(name: str = None) -> MutableMapping:
+    """ Create the session store called name (SESSION_BACKEND by default)
+    """
+    name = name or getenv('SESSION_BACKEND', 'memory')
+    if name not in BACKENDS:
+        raise ValueError("unknown session backend {}".format(name))
+    module, class_name = BACKENDS[name]
+    return getattr(import_module(module), class_name)()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+""" SQLite session store module
+
+    Sessions live in a SQLite database (SESSION_SQLITE_PATH) shared by
+    every process of the API, and survive restarts. Each process keeps a
+    read-through cache of the sessions it resolved, for at most
+    SESSION_CACHE_TTL seconds: a session destroyed by another process is
+    still accepted here for that long at most
+"""
+from collections.abc import MutableMapping
+from os import getenv, getpid
+from typing import Iterator
+import sqlite3
+import threading
+import time
+from api.v1.auth.session_store import (DURATION, MAX_COUNT, SLIDING,
+                                       SWEEP_SLICE, SessionStore)
+
+DB_PATH = getenv('SESSION_SQLITE_PATH', '.db_sessions.sqlite3')
+CACHE_TTL = float(getenv('SESSION_CACHE_TTL', '1'))
+CACHE_SIZE = int(getenv('SESSION_CACHE_SIZE', '10000'))
+# seconds a writer waits for the database lock held by another writer
+TIMEOUT = float(getenv('SESSION_SQLITE_TIMEOUT', '5'))
+
+
+def _enable_wal(conn: sqlite3.Connection):
+    """ Switch the database to WAL mode if it is not yet
+        The switch needs the database to itself and does not wait for the
+        busy timeout, so processes starting together retry it until
+        TIMEOUT
+    """
+    deadline = time.monotonic() + TIMEOUT
+    while True:
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                conn.execute("PRAGMA journal_mode=WAL")
+            return
+        except sqlite3.OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+
+
+class SQLiteSessionStore(MutableMapping):
+    """ Mapping of session IDs to user IDs kept in SQLite, with the
+        expiry and eviction rules of SessionStore
+        The expiry (when sliding) and the last use of a session are
+        updated in the database when it is read through the cache, so
+        their precision is SESSION_CACHE_TTL
+    """
+
+    def __init__(self, db_path: str = None, duration: float = None,
+                 max_count: int = None, sliding: bool = None,
+                 cache_ttl: float = None):
+        """ Initialize the store over db_path (defaults from the
+            environment), creating its table if needed
+        """
+        self.db_path = db_path or DB_PATH
+        self.duration = DURATION if duration is None else duration
+        self.max_count = MAX_COUNT if max_count is None else max_count
+        self.sliding = SLIDING if sliding is None else sliding
+        self.cache_ttl = CACHE_TTL if cache_ttl is None else cache_ttl
+        self._cache = SessionStore(self.cache_ttl, CACHE_SIZE, False)
+        self._local = threading.local()
+        self.evictions = 0
+        self.expirations = 0
+        conn = self._connection()
+        _enable_wal(conn)
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT "
+                     "PRIMARY KEY, user_id TEXT NOT NULL, expires_at REAL, "
+                     "duration REAL NOT NULL, last_used REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at "
+                     "ON sessions (expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used "
+                     "ON sessions (last_used)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread, in autocommit mode
+            A process forked from another one (pre-forking servers) opens
+            its own instead of sharing the one it inherited. WAL mode is
+            kept by the database file: __init__ sets it once
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is None or self._local.pid != getpid():
+            conn = sqlite3.connect(self.db_path, timeout=TIMEOUT,
+                                   isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.pid = getpid()
+        return conn
+
+    def _cache_set(self, session_id: str, user_id: str, expiry: float,
+                   now: float):
+        """ Cache a session, no longer than it lives
+        """
+        ttl = self.cache_ttl if expiry is None \
+            else min(self.cache_ttl, expiry - now)
+        if ttl > 0:
+            self._cache.set(session_id, user_id, ttl)
+
+    def set(self, session_id: str, user_id: str, duration: float = None):
+        """ Store a session lasting duration seconds (default: the
+            duration of the store, 0 for no expiry)
+        """
+        duration = self.duration if duration is None else duration
+        now = time.time()
+        expiry = now + duration if duration > 0 else None
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                     (session_id, user_id, expiry, duration, now))
+        self._cache_set(session_id, user_id, expiry, now)
+        excess = conn.execute("SELECT COUNT(*) FROM sessions"
+                              ).fetchone()[0] - self.max_count
+        if excess > 0:
+            evicted = conn.execute(
+                "DELETE FROM sessions WHERE session_id IN (SELECT session_id"
+                " FROM sessions ORDER BY last_used LIMIT ?)", (excess,))
+            self.evictions += evicted.rowcount
+        self.sweep()
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """ Store a session with the duration of the store
+        """
+        self.set(session_id, user_id)
+
+    def __getitem__(self, session_id: str) -> str:
+        """ User ID of a live session, from the cache or else from the
+            database
+        """
+        user_id = self._cache.get(session_id)
+        if user_id is not None:
+            return user_id
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute("SELECT user_id, expires_at, duration FROM "
+                           "sessions WHERE session_id = ?",
+                           (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        user_id, expiry, duration = row
+        if expiry is not None and expiry <= now:
+            if conn.execute("DELETE FROM sessions WHERE session_id = ? AND "
+                            "expires_at <= ?", (session_id, now)).rowcount:
+                self.expirations += 1
+            raise KeyError(session_id)
+        if self.sliding and expiry is not None:
+            expiry = now + duration
+        conn.execute("UPDATE sessions SET expires_at = ?, last_used = ? "
+                     "WHERE session_id = ?", (expiry, now, session_id))
+        self._cache_set(session_id, user_id, expiry, now)
+        return user_id
+
+    def __delitem__(self, session_id: str):
+        """ Remove a session
+        """
+        self._cache.pop(session_id, None)
+        if not self._connection().execute(
+                "DELETE FROM sessions WHERE session_id = ?",
+                (session_id,)).rowcount:
+            raise KeyError(session_id)
+
+    def __iter__(self) -> Iterator[str]:
+        """ IDs of the sessions, least recently used first (expired ones
+            not swept yet included)
+        """
+        rows = self._connection().execute(
+            "SELECT session_id FROM sessions ORDER BY last_used").fetchall()
+        return (row[0] for row in rows)
+
+    def __len__(self) -> int:
+        """ Number of sessions, expired ones not swept yet included
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def __repr__(self) -> str:
+        """ The sessions as a dict: {session ID: user ID}
+        """
+        return repr(dict(self._connection().execute(
+            "SELECT session_id, user_id FROM sessions ORDER BY last_used")))
+
+    def sweep(self, limit: int = SWEEP_SLICE) -> int:
+        """ Drop at most limit expired sessions
+            Return the number dropped
+        """
+        dropped = self._connection().execute(
+            "DELETE FROM sessions WHERE session_id IN (SELECT session_id "
+            "FROM sessions WHERE expires_at <= ? LIMIT ?)",
+            (time.time(), limit)).rowcount
+        self.expirations += dropped
+        return dropped
+
+    def stats(self) -> dict:
+        """ Counters of the store; 'active' only counts live sessions,
+            evictions and expirations are the ones of this process
+        """
+        active = self._connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at IS NULL OR "
+            "expires_at > ?", (time.time(),)).fetchone()[0]
+        return {'active': active, 'evictions': self.evictions,
+                'expirations': self.expirations}
@@ -2,6 +2,8 @@
 """Module of Index views
 """
 from flask import jsonify, abort
+from os import getenv
+from api.v1.auth.session_auth import SessionAuth
 from api.v1.views import app_views
 from models.user import User
 
@@ -20,9 +22,12 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the counters of the sessions with session authentication
     """
     stats = {}
     stats['users'] = User.count()
+    if getenv('AUTH_TYPE') == 'session_auth':
+        stats['sessions'] = SessionAuth.user_id_by_session_id.stats()
     return jsonify(stats)
 
 
@@ -2,6 +2,7 @@
 """View Session Authentication Module"""
 
 from api.v1.views import app_views
+from api.v1.auth.auth import SESSION_NAME
 from flask import request, jsonify, abort
 from models.user import User
 import os
@@ -50,8 +51,7 @@ def login():
         return jsonify({"error": "wrong password"}), 401
     session_id = auth.create_session(user.id)
     response = jsonify(user.to_json())
-    session_name = os.getenv('SESSION_NAME')
-    response.set_cookie(session_name, session_id)
+    response.set_cookie(SESSION_NAME, session_id)
     return response
 
 
@@ -2,18 +2,128 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import Response, abort, jsonify, request
+from itertools import islice
+from os import getenv
+from typing import Callable, Iterable, Iterator
+import hashlib
+import json
+import threading
 from models.user import User
 
+# users serialized per chunk of a streamed list
+STREAM_CHUNK = 100
+
+# serialized users: id -> (version, JSON text). Saving a user changes its
+# version, which invalidates its entry
+JSON_CACHE = OrderedDict()
+JSON_CACHE_SIZE = int(getenv('USERS_JSON_CACHE_SIZE', '10000'))
+_json_cache_lock = threading.Lock()
+
+# JSON encoder with the settings of jsonify, built once instead of once
+# per user
+_dumps = json.JSONEncoder(sort_keys=True, separators=(",", ":")).encode
+
+
+def _user_json(user: User, dumps: Callable[[dict], str]) -> str:
+    """ Serialized to_json() of a user, cached until it is saved again
+    """
+    with _json_cache_lock:
+        cached = JSON_CACHE.get(user.id)
+        if cached is not None and cached[0] == user.version:
+            JSON_CACHE.move_to_end(user.id)
+            return cached[1]
+    text = dumps(user.to_json())
+    with _json_cache_lock:
+        JSON_CACHE[user.id] = (user.version, text)
+        JSON_CACHE.move_to_end(user.id)
+        if len(JSON_CACHE) > JSON_CACHE_SIZE:
+            JSON_CACHE.popitem(last=False)
+    return text
+
+
+def _not_modified(etag: str, last_modified: datetime = None) -> bool:
+    """ Tell if the copy of the client is current: its If-None-Match
+        holds etag or, without one, its If-Modified-Since is not older
+        than last_modified
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return since is not None and last_modified is not None and \
+        last_modified <= since
+
+
+def _stream_json(users: Iterable[User], fields: set = None) -> Iterator[str]:
+    """ JSON list of users (only their fields if given), produced chunk
+        by chunk like jsonify would render the whole list
+    """
+    def generate():
+        chunk = ["["]
+        for i, user in enumerate(users):
+            if i:
+                chunk.append(",")
+            if fields is None:
+                chunk.append(_user_json(user, _dumps))
+            else:
+                obj = user.to_json()
+                chunk.append(_dumps({k: v for k, v in obj.items()
+                                     if k in fields}))
+            if len(chunk) >= 2 * STREAM_CHUNK:
+                yield "".join(chunk)
+                chunk = []
+        chunk.append("]\n")
+        yield "".join(chunk)
+    return generate()
+
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users returned
+      - cursor: ID of the last user of the previous page
+      - fields: comma-separated list of the attributes returned
     Return:
-      - list of all User objects JSON represented
+      - list of User objects JSON represented, streamed; the
+        X-Next-Cursor header holds the cursor of the next page if any
+      - 304 if the If-None-Match ETag is current: it changes with the
+        query and whenever a user is saved or removed
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    if limit is not None:
+        limit = int(limit) if limit.isdecimal() else 0
+        if limit < 1:
+            return jsonify({'error': "Invalid limit"}), 400
+    cursor = request.args.get('cursor')
+    if cursor is not None and User.get(cursor) is None:
+        return jsonify({'error': "Invalid cursor"}), 400
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = set(fields.split(','))
+    generation = User.generation()
+    etag = None
+    if generation is not None:
+        etag = hashlib.sha1("{}?{}".format(
+            generation, request.query_string.decode()).encode()).hexdigest()
+        if _not_modified(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+    users = User.iter_all(cursor)
+    headers = {'ETag': '"{}"'.format(etag)} if etag is not None else {}
+    if limit is not None:
+        users = list(islice(users, limit + 1))
+        if len(users) > limit:
+            users.pop()
+            headers['X-Next-Cursor'] = users[-1].id
+    return Response(_stream_json(users, fields), headers=headers,
+                    mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -22,7 +132,9 @@ def view_one_user(user_id: str = None) -> str:
     Path parameter:
       - User ID
     Return:
-        - User object JSON represented
+        - User object JSON represented, with its ETag and Last-Modified
+        - 304 if the If-None-Match ETag (or the If-Modified-Since
+          date) is current
         - 404 if the User ID doesn't exist
         Update method for the route GET /api/v1/users/<user_id>
         in api/v1/views/users.py: If <user_id> is equal to me and
@@ -34,13 +146,23 @@ def view_one_user(user_id: str = None) -> str:
     """
     if user_id is None:
         abort(404)
-    if user_id == 'me' and request.current_user is None:
-        abort(404)
-    return jsonify(request.current_user.to_json())
-    user = User.get(user_id)
+    if user_id == 'me':
+        user = request.current_user
+    else:
+        user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    etag = "{}-{:x}".format(user.id, user.version)
+    last_modified = user.updated_at.replace(microsecond=0,
+                                            tzinfo=timezone.utc)
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = Response(_user_json(user, _dumps) + "\n",
+                            mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -58,6 +180,8 @@ def delete_user(user_id: str = None) -> str:
     if user is None:
         abort(404)
     user.remove()
+    with _json_cache_lock:
+        JSON_CACHE.pop(user.id, None)
     return jsonify({}), 200
 
 
@@ -130,3 +254,118 @@ def update_user(user_id: str = None) -> str:
         user.last_name = rj.get('last_name')
     user.save()
     return jsonify(user.to_json()), 200
+
+
+# operations accepted by POST /api/v1/users/bulk
+BULK_OPS = ('create', 'update', 'delete')
+
+
+def _bulk_items() -> list:
+    """ Items of a bulk request: a JSON array, or one JSON object per line
+        when the body is NDJSON. None if malformed
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        try:
+            return [json.loads(line)
+                    for line in request.get_data().splitlines()
+                    if line.strip()]
+        except ValueError:
+            return None
+    items = request.get_json(silent=True)
+    return items if type(items) is list else None
+
+
+def _check_bulk(items: list) -> list:
+    """ Validate every item against the store and against the other
+        items: return the list of (index, status, error) of the invalid
+        ones, and put the user each valid update or delete targets
+        under its '_user' key
+    """
+    errors = []
+    emails = set()
+    targets = set()
+    for i, item in enumerate(items):
+        op = item.get('op') if type(item) is dict else None
+        if op not in BULK_OPS:
+            errors.append((i, 400, "Wrong format"))
+        elif op == 'create':
+            email = item.get('email', "")
+            if email == "":
+                errors.append((i, 400, "email missing"))
+            elif item.get('password', "") == "":
+                errors.append((i, 400, "password missing"))
+            elif type(email) is not str:
+                errors.append((i, 400, "Wrong format"))
+            elif email in emails or User.search({'email': email}):
+                errors.append((i, 400, "Can't create User: email {} "
+                                       "already exists".format(email)))
+            else:
+                emails.add(email)
+        else:
+            user = User.get(item.get('id')) \
+                if type(item.get('id')) is str else None
+            if user is None:
+                errors.append((i, 404, "Not found"))
+            elif user.id in targets:
+                errors.append((i, 400, "User {} already in this "
+                                       "request".format(user.id)))
+            targets.add(item.get('id'))
+            item['_user'] = user
+    return errors
+
+
+def _apply_bulk(item: dict) -> dict:
+    """ Apply one validated item, return its result
+    """
+    op = item['op']
+    if op == 'create':
+        user = User()
+        user.email = item.get("email")
+        user.password = item.get("password")
+        user.first_name = item.get("first_name")
+        user.last_name = item.get("last_name")
+        user.save()
+        return {'op': op, 'id': user.id, 'status': 201}
+    user = item['_user']
+    if op == 'update':
+        if item.get('first_name') is not None:
+            user.first_name = item.get('first_name')
+        if item.get('last_name') is not None:
+            user.last_name = item.get('last_name')
+        user.save()
+    else:
+        user.remove()
+        with _json_cache_lock:
+            JSON_CACHE.pop(user.id, None)
+    return {'op': op, 'id': user.id, 'status': 200}
+
+
+@app_views.route('/users/bulk', methods=['POST'], strict_slashes=False)
+def bulk_users() -> str:
+    """ POST /api/v1/users/bulk
+    Body: JSON array, or NDJSON (Content-Type application/x-ndjson), of:
+      - {"op": "create", "email", "password", "first_name", "last_name"}
+      - {"op": "update", "id", "first_name", "last_name"}
+      - {"op": "delete", "id"}
+    All items are validated first, then applied, in one transaction: the
+    store is written once and no other request changes it in between
+    Return:
+      - {"results": [{"op", "id", "status"}, ...]} in the item order
+      - 400 if an item is invalid, with the error of every invalid item
+        in "results"; nothing is applied
+      - 409 if an item still fails while applying
+    """
+    items = _bulk_items()
+    if items is None:
+        return jsonify({'error': "Wrong format"}), 400
+    try:
+        with User.transaction():
+            errors = _check_bulk(items)
+            if errors:
+                return jsonify({'results': [
+                    {'index': i, 'status': status, 'error': error}
+                    for i, status, error in errors]}), 400
+            results = [_apply_bulk(item) for item in items]
+    except ValueError as e:
+        return jsonify({'error': "Can't apply: {}".format(e)}), 409
+    return jsonify({'results': results}), 200
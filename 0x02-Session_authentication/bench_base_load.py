@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Benchmark of User.load_from_file startup time and peak memory,
+    eager against lazy (STORAGE_LAZY=1) loading, plus a first lookup
+    Usage: ./bench_base_load.py [size]   (default: 1M)
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from models.lazy import write_records
+
+PROBE = """
+import resource, time
+from models.user import User
+start = time.perf_counter()
+User.load_from_file()
+loaded = time.perf_counter() - start
+start = time.perf_counter()
+user = User.search({"email": "user42@hbtn.io"})[0]
+User.get(user.id).display_name()
+lookup = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print("{:.2f}s load, {:.3f}ms first lookup, {:.0f} MiB peak RSS".format(
+    loaded, lookup * 1000, rss))
+"""
+
+
+def records(size: int):
+    """ Yields (id, JSON text) of size users """
+    for i in range(size):
+        user_id = "user-{}".format(i)
+        yield user_id, json.dumps({
+            "id": user_id, "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+            "email": "user{}@hbtn.io".format(i), "_password": "0" * 64,
+            "first_name": "first{}".format(i), "last_name": None})
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    project = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp())
+    write_records(".db_User.json", records(size))
+    print("{} users, {:.0f} MiB file".format(
+        size, os.path.getsize(".db_User.json") / 2 ** 20))
+    for mode in ("0", "1"):
+        env = dict(os.environ, PYTHONPATH=project, STORAGE_LAZY=mode)
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env,
+                             check=True, capture_output=True, text=True)
+        print("{:>5}: {}".format("lazy" if mode == "1" else "eager",
+                                 out.stdout.strip()))
+    os.remove(".db_User.json")
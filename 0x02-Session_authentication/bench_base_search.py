@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Benchmark of User.search by email: secondary index against a linear
+    scan (same lookup on the unindexed first_name attribute)
+    Usage: ./bench_base_search.py [size ...]   (default: 10k 100k 1M)
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from models.user import User
+
+
+def write_users(file_path: str, size: int):
+    """ Writes a .db_User.json file holding size users """
+    with open(file_path, 'w') as f:
+        f.write("{")
+        for i in range(size):
+            user_id = "user-{}".format(i)
+            obj = {"id": user_id, "created_at": "2024-01-01T00:00:00",
+                   "updated_at": "2024-01-01T00:00:00",
+                   "email": "user{}@hbtn.io".format(i),
+                   "_password": "0" * 64, "first_name": "first{}".format(i),
+                   "last_name": None}
+            f.write("{}{}: {}".format("," if i else "", json.dumps(user_id),
+                                      json.dumps(obj)))
+        f.write("}")
+
+
+def per_lookup(attr: str, size: int, lookups: int) -> float:
+    """ Average seconds per User.search({attr: ...}) """
+    keys = [random.randrange(size) for _ in range(lookups)]
+    prefix = "user" if attr == "email" else "first"
+    suffix = "@hbtn.io" if attr == "email" else ""
+    start = time.perf_counter()
+    for i in keys:
+        assert len(User.search({attr: "{}{}{}".format(prefix, i, suffix)}))
+    return (time.perf_counter() - start) / lookups
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in sys.argv[1:]] or [10000, 100000, 1000000]
+    os.chdir(tempfile.mkdtemp())
+    for size in sizes:
+        write_users(".db_User.json", size)
+        start = time.perf_counter()
+        User.load_from_file()
+        loaded = time.perf_counter() - start
+        indexed = per_lookup("email", size, 1000)
+        linear = per_lookup("first_name", size, 20)
+        print("{:>8} users: load {:.2f}s, indexed {:.2f} us, "
+              "linear {:.2f} us (x{:.0f})".format(
+                  size, loaded, indexed * 1e6, linear * 1e6,
+                  linear / indexed))
+        os.remove(".db_User.json")
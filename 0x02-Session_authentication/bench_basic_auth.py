@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Benchmark of the throughput of requests authenticated by BasicAuth
+    (GET /api/v1/users/me), and of BasicAuth.current_user alone, with and
+    without the cache of verified headers, for the file and sqlite
+    storage engines
+    Usage: ./bench_basic_auth.py [requests]   (default: 5000)
+"""
+import base64
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = {
+    "file, no cache": {"STORAGE_ENGINE": "file", "BASIC_AUTH_CACHE_TTL": "0"},
+    "file, cache": {"STORAGE_ENGINE": "file"},
+    "sqlite, no cache": {"STORAGE_ENGINE": "sqlite",
+                         "BASIC_AUTH_CACHE_TTL": "0"},
+    "sqlite, cache": {"STORAGE_ENGINE": "sqlite"},
+}
+USERS = 1000
+
+
+def run(count: int) -> tuple:
+    """ Requests per second of count authenticated requests spread over
+        10 clients, and microseconds per current_user call
+    """
+    from api.v1.app import app, auth
+    from models.user import User
+    with User.transaction():
+        for i in range(USERS):
+            user = User(email="user{}@hbtn.io".format(i))
+            user.password = "pwd{}".format(i)
+            user.save()
+    headers = [{"Authorization": "Basic " + base64.b64encode(
+        "user{0}@hbtn.io:pwd{0}".format(i).encode()).decode()}
+        for i in range(0, USERS, USERS // 10)]
+    client = app.test_client()
+    start = time.perf_counter()
+    for i in range(count):
+        response = client.get("/api/v1/users/me",
+                              headers=headers[i % len(headers)])
+        assert response.status_code == 200
+    throughput = count / (time.perf_counter() - start)
+    with app.test_request_context("/api/v1/users/me", headers=headers[0]):
+        from flask import request
+        auth.current_user(request)
+        start = time.perf_counter()
+        for _ in range(count):
+            auth.current_user(request)
+        elapsed = time.perf_counter() - start
+    return throughput, elapsed / count * 1e6
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    if len(sys.argv) > 2:
+        print("{:>16}: {:.0f} requests/s, current_user {:.1f} us".format(
+            sys.argv[2], *run(count)))
+        sys.exit(0)
+    project = os.path.dirname(os.path.abspath(__file__))
+    for name, variables in RUNS.items():
+        env = dict(os.environ, PYTHONPATH=project, AUTH_TYPE="basic_auth",
+                   **variables)
+        subprocess.run([sys.executable, os.path.abspath(__file__),
+                        str(count), name], env=env, check=True,
+                       cwd=tempfile.mkdtemp())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+""" Microbenchmark of the before_request hook of api/v1/app.py with
+    session authentication, with and without the cache of the resolved
+    users, for the file and sqlite storage engines
+    Usage: ./bench_before_request.py [calls]   (default: 20000)
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = {
+    "file, no user cache": {"STORAGE_ENGINE": "file",
+                            "SESSION_USER_CACHE_TTL": "0"},
+    "file, user cache": {"STORAGE_ENGINE": "file"},
+    "sqlite, no user cache": {"STORAGE_ENGINE": "sqlite",
+                              "SESSION_USER_CACHE_TTL": "0"},
+    "sqlite, user cache": {"STORAGE_ENGINE": "sqlite"},
+}
+
+
+def run(calls: int) -> float:
+    """ Microseconds per before_request call of an authenticated GET
+        (best of 5 rounds)
+    """
+    from api.v1.app import app, auth, before_request
+    from models.user import User
+    for i in range(1000):
+        User(email="user{}@hbtn.io".format(i)).save()
+    session_id = auth.create_session(User.search({"email": "user1@hbtn.io"}
+                                                 )[0].id)
+    headers = {"Cookie": "sid={}".format(session_id)}
+    with app.test_request_context("/api/v1/users/me", headers=headers):
+        from flask import request
+        before_request()
+        assert request.current_user.email == "user1@hbtn.io"
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(calls // 5):
+                before_request()
+            best = min(best, time.perf_counter() - start)
+        return best / (calls // 5) * 1e6
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    if len(sys.argv) > 2:
+        print("{:>22}: {:.1f} us/request".format(sys.argv[2], run(calls)))
+        sys.exit(0)
+    project = os.path.dirname(os.path.abspath(__file__))
+    for name, variables in RUNS.items():
+        env = dict(os.environ, PYTHONPATH=project, AUTH_TYPE="session_auth",
+                   SESSION_NAME="sid", **variables)
+        subprocess.run([sys.executable, os.path.abspath(__file__),
+                        str(calls), name], env=env, check=True,
+                       cwd=tempfile.mkdtemp())
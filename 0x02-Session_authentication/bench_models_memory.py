@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+""" Benchmark of the memory held per 100k users: slotted User records
+    against the previous layout (instance __dict__ and datetime fields)
+    Usage: ./bench_models_memory.py [size]   (default: 100k)
+"""
+import sys
+import tracemalloc
+from datetime import datetime
+from models.base import TIMESTAMP_FORMAT
+from models.engine.file_storage import DATA, FileStorage
+from models.user import User
+
+
+class DictUser():
+    """ Previous record layout, for reference """
+
+    def __init__(self, **kwargs):
+        """ Initialize like Base and User used to """
+        self.id = kwargs.get('id')
+        self.created_at = datetime.strptime(kwargs.get('created_at'),
+                                            TIMESTAMP_FORMAT)
+        self.updated_at = datetime.strptime(kwargs.get('updated_at'),
+                                            TIMESTAMP_FORMAT)
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+def record(i: int) -> dict:
+    """ Serialized user number i """
+    return {"id": "user-{}".format(i), "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+            "email": "user{}@hbtn.io".format(i), "_password": "0" * 64,
+            "first_name": "first{}".format(i), "last_name": None}
+
+
+def measure(build, size: int) -> int:
+    """ Bytes still allocated after building size records with build """
+    tracemalloc.start()
+    objs = build(size)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return current
+
+
+def build_users(size: int):
+    """ Builds size slotted users """
+    return {obj["id"]: User(**obj) for obj in map(record, range(size))}
+
+
+def build_indexes(size: int):
+    """ Stores size users in DATA, then measures their indexes only """
+    User.load_from_file()
+    tracemalloc.stop()
+    DATA["User"] = build_users(size)
+    tracemalloc.start()
+    storage = FileStorage()
+    for user in DATA["User"].values():
+        storage._index(user)
+
+
+def build_dict_users(size: int):
+    """ Builds size records with the previous layout """
+    return {obj["id"]: DictUser(**obj) for obj in map(record, range(size))}
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    per = 100000 / size / 2 ** 20
+    previous = measure(build_dict_users, size)
+    slotted = measure(build_users, size)
+    indexes = measure(build_indexes, size)
+    print("previous layout: {:.1f} MiB per 100k users".format(previous * per))
+    print("slotted records: {:.1f} MiB per 100k users".format(slotted * per))
+    print("email index:     {:.1f} MiB per 100k users".format(indexes * per))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Benchmark of Auth.require_auth with hundreds of excluded paths: the
+    loop over a list of patterns against the compiled PathMatcher, after
+    checking that both agree on every path tried
+    Usage: ./bench_require_auth.py [patterns]   (default: 500)
+"""
+import random
+import sys
+import time
+from api.v1.auth.auth import Auth, PathMatcher
+
+ROUTES = ("status", "stats", "users", "sessions", "static", "stamps",
+          "unauthorized", "forbidden", "auth_session", "auth_basic")
+
+
+def random_path(rng: random.Random) -> str:
+    """ Path of an API route, possibly cut short or with a trailing slash
+    """
+    parts = ["/api/v{}".format(rng.randint(1, 3)), rng.choice(ROUTES)]
+    for _ in range(rng.randint(0, 2)):
+        parts.append(rng.choice(ROUTES + ("{:x}".format(rng.getrandbits(16)),
+                                          )))
+    path = "/".join(parts)
+    path = path[:rng.randint(1, len(path))] if rng.random() < 0.3 else path
+    return path + "/" if rng.random() < 0.5 else path
+
+
+def patterns(count: int, rng: random.Random) -> list:
+    """ count excluded paths, a third of them ending by * """
+    result = []
+    for _ in range(count):
+        path = random_path(rng)
+        if rng.random() < 0.33:
+            path = path.rstrip("/")[:rng.randint(10, 30)] + "*"
+            path += "/" if rng.random() < 0.3 else ""
+        result.append(path)
+    return result
+
+
+def timed(function, paths: list) -> float:
+    """ Microseconds per call of function on paths (best of 5 rounds) """
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for path in paths:
+            function(path)
+        best = min(best, time.perf_counter() - start)
+    return best / len(paths) * 1e6
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = random.Random(0)
+    excluded = patterns(count, rng)
+    paths = [random_path(rng) for _ in range(20000)] + excluded
+    auth = Auth()
+    start = time.perf_counter()
+    matcher = PathMatcher(excluded)
+    built = time.perf_counter() - start
+    for path in paths:
+        assert auth.require_auth(path, matcher) == \
+            auth.require_auth(path, excluded), path
+    print("{} patterns, {} paths agree; matcher built in {:.1f} ms".format(
+        count, len(paths), built * 1e3))
+    print("  loop:    {:.2f} us/path".format(
+        timed(lambda path: auth.require_auth(path, excluded), paths)))
+    print("  matcher: {:.2f} us/path".format(
+        timed(lambda path: auth.require_auth(path, matcher), paths)))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Benchmark of User.load_from_file startup time and peak memory on
+    .db_User.json (eager, then lazy) against the binary snapshot
+    (STORAGE_SNAPSHOT=1), plus a first lookup
+    Usage: ./bench_snapshot_load.py [size]   (default: 1M)
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from bench_base_load import PROBE, records
+from models.lazy import write_records
+
+MODES = {
+    "json eager": {},
+    "json lazy": {"STORAGE_LAZY": "1"},
+    "snapshot": {"STORAGE_SNAPSHOT": "1"},
+}
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    project = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(tempfile.mkdtemp())
+    write_records(".db_User.json", records(size))
+    env = dict(os.environ, PYTHONPATH=project)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "models.snapshot", ".db_User.json",
+                    ".db_User.snapshot"], env=env, check=True)
+    print("{} users, {:.0f} MiB JSON, {:.0f} MiB snapshot "
+          "(converted in {:.2f}s)".format(
+              size, os.path.getsize(".db_User.json") / 2 ** 20,
+              os.path.getsize(".db_User.snapshot") / 2 ** 20,
+              time.perf_counter() - start))
+    for name, variables in MODES.items():
+        env = dict(os.environ, PYTHONPATH=project, **variables)
+        out = subprocess.run([sys.executable, "-c", PROBE], env=env,
+                             check=True, capture_output=True, text=True)
+        print("{:>10}: {}".format(name, out.stdout.strip()))
+    os.remove(".db_User.json")
+    os.remove(".db_User.snapshot")
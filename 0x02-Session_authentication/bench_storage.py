@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+""" Benchmark of the storage engines (STORAGE_ENGINE=file with the
+    journal, alone, in multi-process or in snapshot mode, and
+    STORAGE_ENGINE=sqlite): every engine first runs the same behaviour
+    checks, then the same workload on size users
+    Usage: ./bench_storage.py [size]   (default: 10k)
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ENGINES = {
+    "file": {"STORAGE_ENGINE": "file", "STORAGE_JOURNAL": "1"},
+    "file multi-process": {"STORAGE_ENGINE": "file",
+                           "STORAGE_MULTIPROCESS": "1"},
+    "file write-behind": {"STORAGE_ENGINE": "file",
+                          "STORAGE_WRITE_BEHIND": "1"},
+    "file write-behind journal": {"STORAGE_ENGINE": "file",
+                                  "STORAGE_JOURNAL": "1",
+                                  "STORAGE_WRITE_BEHIND": "1"},
+    "file snapshot": {"STORAGE_ENGINE": "file", "STORAGE_JOURNAL": "1",
+                      "STORAGE_SNAPSHOT": "1"},
+    "sqlite": {"STORAGE_ENGINE": "sqlite"},
+}
+
+
+def check(User):
+    """ Behaviour every engine must share """
+    User.load_from_file()
+    assert User.count() == 0 and User.all() == []
+    user = User(email="bob@hbtn.io", first_name="Bob")
+    user.save()
+    try:
+        User(email="bob@hbtn.io").save()
+        raise AssertionError("duplicate email saved")
+    except ValueError:
+        pass
+    user.last_name = "Dylan"
+    user.save()
+    other = User(email="alice@hbtn.io")
+    other.save()
+    updated_at = user.updated_at
+    user.email = "alice@hbtn.io"
+    try:
+        user.save()
+        raise AssertionError("duplicate email saved by an update")
+    except ValueError:
+        pass
+    assert user.updated_at == updated_at
+    user.email = "bob@hbtn.io"
+    assert [u.id for u in User.search({"email": "bob@hbtn.io"})] == [user.id]
+    other.first_name = "Alice"
+    other.save()
+    User.load_from_file()
+    assert [u.id for u in User.search({"email": "alice@hbtn.io"})] == \
+        [other.id]
+    other.remove()
+    assert User.get(user.id).last_name == "Dylan"
+    assert User.get("unknown") is None
+    assert [u.id for u in User.search({"email": "bob@hbtn.io"})] == [user.id]
+    assert [u.id for u in User.search({"first_name": "Bob",
+                                       "last_name": "Dylan"})] == [user.id]
+    assert User.search({"first_name": "Bob", "last_name": None}) == []
+    other = User(email="alice@hbtn.io")
+    with User.transaction():
+        other.save()
+        user.remove()
+    assert [u.id for u in User.all()] == [other.id]
+    other.remove()
+    User.load_from_file()
+    assert User.count() == 0
+
+
+def timed(name: str, count: int, function):
+    """ Runs function and prints its time per operation """
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print("  {:<28} {:>9.1f} us/op".format(name, elapsed / count * 1e6))
+
+
+def run(size: int):
+    """ Checks then times the engine selected in the environment """
+    from models.user import User
+    check(User)
+    users = [User(email="user{}@hbtn.io".format(i),
+                  first_name="first{}".format(i)) for i in range(size)]
+    picks = [random.randrange(size) for _ in range(1000)]
+
+    def insert():
+        with User.transaction():
+            for user in users:
+                user.save()
+
+    def update():
+        for i in picks:
+            users[i].last_name = "last"
+            users[i].save()
+
+    def get():
+        for i in picks:
+            assert User.get(users[i].id) is not None
+
+    def search(attr: str, value: str, count: int):
+        def function():
+            for i in picks[:count]:
+                assert len(User.search({attr: value.format(i)})) == 1
+        return function
+
+    timed("insert (one transaction)", size, insert)
+    timed("save", len(picks), update)
+    timed("get", len(picks), get)
+    timed("search indexed email", len(picks),
+          search("email", "user{}@hbtn.io", len(picks)))
+    timed("search first_name", 20, search("first_name", "first{}", 20))
+    timed("count", 1, User.count)
+    timed("all (per user)", size, User.all)
+    User.flush()
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    if len(sys.argv) > 2:
+        run(size)
+        sys.exit(0)
+    project = os.path.dirname(os.path.abspath(__file__))
+    for name, variables in ENGINES.items():
+        print("{} ({} users):".format(name, size), flush=True)
+        env = dict(os.environ, PYTHONPATH=project, **variables)
+        subprocess.run([sys.executable, os.path.abspath(__file__), str(size),
+                        name], env=env, check=True, cwd=tempfile.mkdtemp())
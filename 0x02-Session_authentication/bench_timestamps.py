@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Benchmark of the timestamp codec against strptime/strftime, on
+    User.load_from_file and GET /api/v1/users
+    Usage: ./bench_timestamps.py [size]   (default: 100k)
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from bench_base_load import records
+from models.lazy import write_records
+import models.base
+
+EPOCH = datetime(1970, 1, 1)
+FORMAT = models.base.TIMESTAMP_FORMAT
+
+
+def strptime_parse(text: str) -> int:
+    """ Previous parsing path """
+    return (datetime.strptime(text, FORMAT) - EPOCH) // \
+        timedelta(microseconds=1)
+
+
+def strftime_format(micros: int, precise: bool = False) -> str:
+    """ Previous formatting path """
+    return (EPOCH + timedelta(microseconds=micros)).strftime(
+        FORMAT + (".%f" if precise else ""))
+
+
+def run(client, user_cls) -> tuple:
+    """ Seconds taken by load_from_file and by GET /api/v1/users """
+    start = time.perf_counter()
+    user_cls.load_from_file()
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    response = client.get("/api/v1/users")
+    assert response.status_code == 200
+    return loaded, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    os.chdir(tempfile.mkdtemp())
+    write_records(".db_User.json", records(size))
+    os.environ["AUTH_TYPE"] = "none"
+    from api.v1.app import app
+    from models.user import User
+    client = app.test_client()
+
+    previous = (strptime_parse, strftime_format)
+    codec = (models.base.parse_timestamp, models.base.format_timestamp)
+    for name, (parse, fmt) in (("strptime/strftime", previous),
+                               ("codec", codec)):
+        models.base.parse_timestamp = parse
+        models.base.format_timestamp = fmt
+        loaded, listed = run(client, User)
+        print("{:>17}: load_from_file {:.2f}s, GET /api/v1/users {:.2f}s"
+              .format(name, loaded, listed))
+    os.remove(".db_User.json")
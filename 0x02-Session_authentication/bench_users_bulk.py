@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Load test of a user import: one POST /api/v1/users per user against
+    POST /api/v1/users/bulk (one JSON array, or NDJSON), for the storage
+    engine of the environment (STORAGE_ENGINE, STORAGE_JOURNAL...)
+    Usage: ./bench_users_bulk.py [size]   (default: 2000)
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def users(size: int, prefix: str) -> list:
+    """ Create items of size users """
+    return [{"op": "create", "email": "{}{}@hbtn.io".format(prefix, i),
+             "password": "pwd{}".format(i), "first_name": "first{}".format(i)}
+            for i in range(size)]
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    os.chdir(tempfile.mkdtemp())
+    os.environ["AUTH_TYPE"] = "none"
+    from api.v1.app import app
+    from models.user import User
+
+    client = app.test_client()
+    start = time.perf_counter()
+    for item in users(size, "single"):
+        assert client.post("/api/v1/users", json=item).status_code == 201
+    single = time.perf_counter() - start
+    print("{:>14}: {:.2f}s, {:.0f} users/s".format(
+        "single POSTs", single, size / single))
+
+    start = time.perf_counter()
+    response = client.post("/api/v1/users/bulk", json=users(size, "array"))
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    print("{:>14}: {:.2f}s, {:.0f} users/s, x{:.0f}".format(
+        "bulk array", elapsed, size / elapsed, single / elapsed))
+
+    body = "".join(json.dumps(item) + "\n" for item in users(size, "lines"))
+    start = time.perf_counter()
+    response = client.post("/api/v1/users/bulk", data=body,
+                           content_type="application/x-ndjson")
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    print("{:>14}: {:.2f}s, {:.0f} users/s, x{:.0f}".format(
+        "bulk NDJSON", elapsed, size / elapsed, single / elapsed))
+
+    User.flush()
+    User.load_from_file()
+    assert User.count() == 3 * size
+    for name in os.listdir():
+        os.remove(name)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+""" Benchmark of a full GET /api/v1/users export: the previous jsonify of
+    the whole list against the streamed response (time to first byte,
+    total time and peak memory allocated while serving it)
+    Usage: ./bench_users_export.py [size]   (default: 100k)
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from bench_base_load import records
+from models.lazy import write_records
+
+
+def export(client, url: str) -> tuple:
+    """ Seconds to the first chunk, seconds in all and bytes received """
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    received = len(next(chunks))
+    first = time.perf_counter() - start
+    for chunk in chunks:
+        received += len(chunk)
+    response.close()
+    return first, time.perf_counter() - start, received
+
+
+def peak_memory(client, url: str) -> int:
+    """ Peak bytes allocated while serving url """
+    tracemalloc.start()
+    export(client, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    os.chdir(tempfile.mkdtemp())
+    write_records(".db_User.json", records(size))
+    os.environ["AUTH_TYPE"] = "none"
+    from api.v1.app import app
+    from flask import jsonify
+    from models.user import User
+
+    @app.route("/previous/users")
+    def previous_users():
+        """ Previous GET /api/v1/users """
+        return jsonify([user.to_json() for user in User.all()])
+
+    client = app.test_client()
+    for name, url in (("jsonify list", "/previous/users"),
+                      ("streamed", "/api/v1/users"),
+                      ("2 fields", "/api/v1/users?fields=id,email")):
+        first, total, received = export(client, url)
+        peak = peak_memory(client, url)
+        print("{:>12}: first byte {:.3f}s, total {:.2f}s, peak {:.1f} MiB, "
+              "{:.1f} MiB sent".format(name, first, total, peak / 2 ** 20,
+                                       received / 2 ** 20))
+    os.remove(".db_User.json")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+""" SQLite storage engine module
+
+    One table per model: the id, the serialized object and one indexed
+    column per attribute of cls.indexes (unique ones get a UNIQUE index).
+    The database runs in WAL mode, so readers never wait for the writer,
+    and every thread gets its own connection
+"""
+from contextlib import contextmanager
+from typing import ContextManager, Iterator, List, TypeVar
+from os import getenv, getpid, path
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from models.engine.storage import Storage
+
+DB_PATH = getenv('STORAGE_SQLITE_PATH', '.db.sqlite3')
+# seconds a writer waits for the database lock held by another writer
+TIMEOUT = float(getenv('STORAGE_SQLITE_TIMEOUT', '5'))
+SCALARS = (str, int, float, bool, type(None))
+
+
+def _quote(name: str) -> str:
+    """ Quote an SQL identifier
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _column(value):
+    """ Value stored in an indexed column
+    """
+    return value if type(value) in SCALARS else str(value)
+
+
+def _enable_wal(conn: sqlite3.Connection):
+    """ Switch the database to WAL mode if it is not yet
+        The switch needs the database to itself and does not wait for the
+        busy timeout, so processes starting together retry it until
+        TIMEOUT
+    """
+    deadline = time.monotonic() + TIMEOUT
+    while True:
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                conn.execute("PRAGMA journal_mode=WAL")
+            return
+        except sqlite3.OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+
+
+class SQLiteStorage(Storage):
+    """ Storage engine keeping the objects in a SQLite database
+        Objects are built from their row on every get or search: nothing
+        is cached in memory, so several processes can share the database
+    """
+
+    def __init__(self, db_path: str = None):
+        """ Initialize the engine over db_path (STORAGE_SQLITE_PATH)
+        """
+        self.db_path = db_path or DB_PATH
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._wal = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+            Statements run in autocommit mode unless inside transaction()
+            A process forked from another one (pre-forking servers) opens
+            its own instead of sharing the one it inherited. The first
+            connection of the engine switches the database to WAL mode,
+            which the database file keeps
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is None or self._local.pid != getpid():
+            conn = sqlite3.connect(self.db_path, timeout=TIMEOUT,
+                                   isolation_level=None)
+            if not self._wal:
+                _enable_wal(conn)
+                self._wal = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.pid = getpid()
+        return conn
+
+    def _statements(self, cls: type) -> dict:
+        """ SQL statements of the table of cls, created on first use
+            The statement texts never change, so sqlite3 prepares each of
+            them once per connection and reuses it from its cache
+        """
+        statements = self._tables.get(cls)
+        if statements is not None:
+            return statements
+        with self._lock:
+            statements = self._tables.get(cls)
+            if statements is None:
+                statements = self._create_table(cls)
+                self._tables[cls] = statements
+        return statements
+
+    def _create_table(self, cls: type) -> dict:
+        """ Create the table of cls and its indexes if needed, importing
+            .db_<Class>.json into a new table
+        """
+        s_class = cls.__name__
+        table = _quote(s_class)
+        columns = [_quote(attr) for attr in cls.indexes]
+        conn = self._connection()
+        new = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'"
+                           " AND name = ?", (s_class,)).fetchone() is None
+        conn.execute("CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY, "
+                     "data TEXT NOT NULL{})".format(
+                         table, "".join(", " + c for c in columns)))
+        for (attr, unique), column in zip(cls.indexes.items(), columns):
+            conn.execute("CREATE {}INDEX IF NOT EXISTS {} ON {} ({})".format(
+                "UNIQUE " if unique else "",
+                _quote("{}_{}".format(s_class, attr)), table, column))
+        # generation of the table, bumped by triggers on every change (a
+        # random token tells a recreated database apart)
+        conn.execute('CREATE TABLE IF NOT EXISTS "_generations" (name TEXT '
+                     'PRIMARY KEY, token TEXT NOT NULL, generation INTEGER '
+                     'NOT NULL)')
+        conn.execute('INSERT OR IGNORE INTO "_generations" VALUES (?, ?, 0)',
+                     (s_class, uuid.uuid4().hex))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute('CREATE TRIGGER IF NOT EXISTS {} AFTER {} ON {} '
+                         'BEGIN UPDATE "_generations" SET generation = '
+                         'generation + 1 WHERE name = {}; END'.format(
+                             _quote("{}_{}".format(s_class, event.lower())),
+                             event, table,
+                             "'{}'".format(s_class.replace("'", "''"))))
+        statements = {
+            'save': "INSERT INTO {} (id, data{}) VALUES (?, ?{}) "
+                    "ON CONFLICT (id) DO UPDATE SET data = excluded.data{}"
+                    .format(table, "".join(", " + c for c in columns),
+                            ", ?" * len(columns),
+                            "".join(", {0} = excluded.{0}".format(c)
+                                    for c in columns)),
+            'remove': "DELETE FROM {} WHERE id = ?".format(table),
+            'get': "SELECT data FROM {} WHERE id = ?".format(table),
+            'count': "SELECT COUNT(*) FROM {}".format(table),
+            'generation': 'SELECT token, generation FROM "_generations" '
+                          'WHERE name = ?',
+            'all': "SELECT data FROM {} ORDER BY rowid".format(table),
+            'after': "SELECT data FROM {0} WHERE rowid > (SELECT rowid "
+                     "FROM {0} WHERE id = ?) ORDER BY rowid".format(table),
+        }
+        file_path = ".db_{}.json".format(s_class)
+        if new and path.exists(file_path):
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+            with self.transaction():
+                conn.executemany(statements['save'],
+                                 (self._row(cls(**obj_json))
+                                  for obj_json in objs_json.values()))
+        return statements
+
+    @staticmethod
+    def _row(obj: TypeVar('Base')) -> tuple:
+        """ Values bound to the save statement
+        """
+        return (obj.id, json.dumps(obj.to_json(True))) + \
+            tuple(_column(getattr(obj, attr, None)) for attr in obj.indexes)
+
+    def load(self, cls: type):
+        """ Create the table of cls: rows are read on demand
+        """
+        self._statements(cls)
+
+    def save_all(self, cls: type):
+        """ Every save is already committed: only fold the write-ahead
+            log back into the database file
+        """
+        self._statements(cls)
+        self._connection().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update the row of an object
+        """
+        cls = obj.__class__
+        statements = self._statements(cls)
+        try:
+            self._connection().execute(statements['save'], self._row(obj))
+        except sqlite3.IntegrityError as e:
+            for attr, unique in cls.indexes.items():
+                if unique and "{}.{}".format(cls.__name__, attr) in str(e):
+                    raise ValueError("{} {} already exists".format(
+                        attr, getattr(obj, attr, None))) from None
+            raise
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of an object
+        """
+        statements = self._statements(obj.__class__)
+        self._connection().execute(statements['remove'], (obj.id,))
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        statements = self._statements(cls)
+        return self._connection().execute(statements['count']).fetchone()[0]
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with id obj_id, or None
+        """
+        statements = self._statements(cls)
+        row = self._connection().execute(statements['get'],
+                                         (obj_id,)).fetchone()
+        return cls(**json.loads(row[0])) if row is not None else None
+
+    def iter_all(self, cls: type, after: str = None
+                 ) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects of cls in insertion order, starting
+            after the object with id after (nothing if there is none)
+            Rows are fetched as the iteration goes
+        """
+        statements = self._statements(cls)
+        if after is None:
+            rows = self._connection().execute(statements['all'])
+        else:
+            rows = self._connection().execute(statements['after'], (after,))
+        for row in rows:
+            yield cls(**json.loads(row[0]))
+
+    def generation(self, cls: type) -> str:
+        """ Token of the current state of the table of cls
+        """
+        statements = self._statements(cls)
+        row = self._connection().execute(statements['generation'],
+                                         (cls.__name__,)).fetchone()
+        return "{}-{}".format(*row)
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects of cls matching all attributes
+            Scalar values of the id, of indexed attributes and of other
+            slotted attributes are matched in SQL (through the indexes
+            when there is one); every candidate is then checked in Python
+            like the file engine does
+        """
+        statements = self._statements(cls)
+        sql, params = statements['all'], []
+        clauses = []
+        slots = {key for key, slot in cls._fields() if key == slot}
+        for k, v in attributes.items():
+            if type(v) not in SCALARS:
+                continue
+            if k == 'id' or k in cls.indexes:
+                column = _quote(k)
+            elif k in slots:
+                column = "json_extract(data, '$.{}')".format(k)
+            else:
+                continue
+            if v is None:
+                clauses.append("{} IS NULL".format(column))
+            else:
+                clauses.append("{} = ?".format(column))
+                params.append(v)
+        if clauses:
+            sql = sql.replace(" ORDER BY", " WHERE {} ORDER BY".format(
+                " AND ".join(clauses)))
+        objs = (cls(**json.loads(row[0]))
+                for row in self._connection().execute(sql, params))
+        return [obj for obj in objs
+                if all(getattr(obj, k) == v for k, v in attributes.items())]
+
+    @contextmanager
+    def transaction(self) -> ContextManager:
+        """ Run the saves and removes of the current thread in one SQLite
+            transaction, committed on exit and rolled back on error
+            Nested transactions join the outer one
+        """
+        conn = self._connection()
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+""" Storage engine interface module
+"""
+from typing import ContextManager, Iterable, Iterator, List, TypeVar
+
+
+class Storage():
+    """ Storage engine interface: where and how Base keeps its objects
+        Every method takes the model class (or an instance of it), so one
+        engine serves all models
+    """
+
+    def load(self, cls: type):
+        """ (Re)load the persisted objects of cls
+        """
+        raise NotImplementedError
+
+    def save_all(self, cls: type):
+        """ Persist every object of cls
+        """
+        raise NotImplementedError
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store obj, raising ValueError if one of its unique
+            attributes is already used by another object
+        """
+        raise NotImplementedError
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete obj
+        """
+        raise NotImplementedError
+
+    def count(self, cls: type) -> int:
+        """ Number of objects of cls
+        """
+        raise NotImplementedError
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Object of cls with id obj_id, or None
+        """
+        raise NotImplementedError
+
+    def search(self, cls: type, attributes: dict) -> List[TypeVar('Base')]:
+        """ Objects of cls whose attributes equal all of attributes,
+            in insertion order
+        """
+        raise NotImplementedError
+
+    def all(self, cls: type) -> Iterable[TypeVar('Base')]:
+        """ Every object of cls, in insertion order
+        """
+        return self.search(cls, {})
+
+    def iter_all(self, cls: type, after: str = None
+                 ) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects of cls in insertion order, starting
+            after the object with id after (nothing if there is none)
+        """
+        objs = self.all(cls)
+        if after is not None:
+            ids = [obj.id for obj in objs]
+            objs = objs[ids.index(after) + 1:] if after in ids else []
+        return iter(objs)
+
+    def generation(self, cls: type) -> str:
+        """ Token of the current state of the objects of cls: it changes
+            whenever one of them is saved or removed, in this process or
+            in any other one sharing the store. None if the engine cannot
+            tell
+        """
+        return None
+
+    def flush(self):
+        """ Persist every pending change
+        """
+
+    def transaction(self) -> ContextManager:
+        """ Context manager grouping the saves and removes of the current
+            thread into one write. Other writers wait until it ends.
+            Engines that cannot roll back keep the changes made before an
+            error
+        """
+        raise NotImplementedError
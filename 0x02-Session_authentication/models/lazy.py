@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+""" Lazy object store module
+
+    Lazy mode relies on the layout save_to_file writes for
+    .db_<Class>.json: still one JSON object, but with one record per line
+        {
+        "<id>": {...},
+        "<id>": {...}
+        }
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import (BinaryIO, ContextManager, Dict, Iterable, Iterator, Tuple,
+                    TypeVar)
+import json
+import os
+import tempfile
+import threading
+
+_decoder = json.JSONDecoder()
+
+
+@contextmanager
+def atomic_writer(file_path: str) -> ContextManager[BinaryIO]:
+    """ Binary file replacing file_path once written and synced
+        The temporary file gets a unique name next to file_path, so that
+        concurrent writers never share it
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        prefix="{}.".format(os.path.basename(file_path)), suffix=".tmp",
+        dir=os.path.dirname(file_path) or ".")
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_records(file_path: str,
+                  records: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    """ Atomically write (id, JSON text) records one per line, returning
+        the offset of each record in the new file
+    """
+    offsets = {}
+    with atomic_writer(file_path) as f:
+        f.write(b"{\n")
+        position = 2
+        previous = None
+        for obj_id, text in records:
+            if previous is not None:
+                f.write(previous + b",\n")
+                position += len(previous) + 2
+            offsets[obj_id] = position
+            previous = "{}: {}".format(json.dumps(obj_id), text).encode()
+        if previous is not None:
+            f.write(previous + b"\n")
+        f.write(b"}\n")
+    return offsets
+
+
+def line_layout(file_path: str) -> bool:
+    """ Tell if file_path holds one record per line
+    """
+    with open(file_path, 'rb') as f:
+        return f.readline() == b"{\n"
+
+
+def split_record(line: bytes) -> Tuple[str, str]:
+    """ Split a `"<id>": {...},` line in id and JSON text
+    """
+    text = line.rstrip(b",\r\n").decode('utf-8')
+    obj_id, end = _decoder.raw_decode(text)
+    return obj_id, text[end + 1:].lstrip()
+
+
+def scan(file_path: str, attributes: Tuple[str, ...]
+         ) -> Iterator[Tuple[str, int, tuple]]:
+    """ Stream a one-record-per-line file, yielding the id, the offset
+        and the values of the requested attributes of each record
+    """
+    with open(file_path, 'rb') as f:
+        offset = len(f.readline())
+        for line in f:
+            if line.startswith(b'"'):
+                obj_id, text = split_record(line)
+                values = ()
+                if attributes:
+                    obj_json = json.loads(text)
+                    values = tuple(obj_json.get(k) for k in attributes)
+                yield obj_id, offset, values
+            offset += len(line)
+
+
+class LazyObjects(MutableMapping):
+    """ Mapping id -> object backed by a one-record-per-line file: only
+        the offset of each record is kept, objects are built on first
+        access and held in a bounded LRU cache. Objects stored after
+        loading stay pinned in memory until the file is rewritten
+    """
+
+    def __init__(self, cls: type, file_path: str, offsets: Dict[str, int],
+                 cache_size: int):
+        """ Initialize the store over file_path
+        """
+        self.cls = cls
+        self.cache_size = cache_size
+        self._offsets = offsets
+        self._pinned = {}
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._file = open(file_path, 'rb')
+
+    def _read(self, offset: int) -> Tuple[str, str]:
+        """ Id and JSON text of the record at offset
+        """
+        with self._lock:
+            self._file.seek(offset)
+            return split_record(self._file.readline())
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return the object, building it from the file if needed
+        """
+        with self._lock:
+            offset = self._offsets[obj_id]
+            if offset is None:
+                return self._pinned[obj_id]
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                self._cache.move_to_end(obj_id)
+                return obj
+            obj = self.cls(**json.loads(self._read(offset)[1]))
+            self._cache[obj_id] = obj
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return obj
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Store (pin) an object
+        """
+        with self._lock:
+            self._offsets[obj_id] = None
+            self._pinned[obj_id] = obj
+            self._cache.pop(obj_id, None)
+
+    def __delitem__(self, obj_id: str):
+        """ Delete an object
+        """
+        with self._lock:
+            del self._offsets[obj_id]
+            self._pinned.pop(obj_id, None)
+            self._cache.pop(obj_id, None)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids
+        """
+        return iter(list(self._offsets))
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self._offsets)
+
+    def values(self) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects, skipping the ones deleted since the
+            iteration started
+        """
+        for _, obj in self.items():
+            yield obj
+
+    def items(self) -> Iterator[Tuple[str, TypeVar('Base')]]:
+        """ Iterate over the (id, object) pairs, skipping the objects
+            deleted since the iteration started
+        """
+        for obj_id in self:
+            try:
+                yield obj_id, self[obj_id]
+            except KeyError:
+                continue
+
+    def serialized(self) -> Iterator[Tuple[str, str]]:
+        """ (id, JSON text) of every object: records not stored since
+            loading are copied from the file without being built
+        """
+        for obj_id, offset in list(self._offsets.items()):
+            if offset is None:
+                yield obj_id, json.dumps(self._pinned[obj_id].to_json(True))
+            else:
+                yield obj_id, self._read(offset)[1]
+
+    def rebase(self, file_path: str, offsets: Dict[str, int]):
+        """ Switch to a rewritten file holding every current object:
+            pinned objects move to the cache
+        """
+        with self._lock:
+            self._file.close()
+            self._file = open(file_path, 'rb')
+            self._offsets = offsets
+            self._cache.update(self._pinned)
+            self._pinned = {}
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def close(self):
+        """ Close the backing file
+        """
+        self._file.close()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+""" Binary snapshot module
+
+    A snapshot holds the records of one class in a file read through mmap,
+    so objects and index lookups never need the whole file to be parsed:
+        header      magic, version, number of key tables, number of
+                    records, position of the offset table and of the
+                    directory (little-endian, HEADER)
+        records     id length, JSON length, id, JSON text (RECORD)
+        offsets     position of every record, in record order (u64)
+        key tables  entries sorted by key: position of the key, record
+                    number (ENTRY), then the keys: length, bytes (u32)
+        directory   for every key table: name length (u16), name, number
+                    of entries (u32), position of the entries (u64)
+    The "id" key table is always there, one more is written per indexed
+    attribute. Usage (direction given by the source file):
+        python3 -m models.snapshot .db_User.json .db_User.snapshot
+        python3 -m models.snapshot .db_User.snapshot .db_User.json
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator, List, Tuple, TypeVar
+import argparse
+import json
+import mmap
+import struct
+import threading
+from models.lazy import atomic_writer, write_records
+
+MAGIC = b"BASESNAP"
+VERSION = 2
+# version 1 key tables have no entry for None values
+NULL_KEYS_VERSION = 2
+HEADER = struct.Struct("<8sHHIQQ")
+RECORD = struct.Struct("<II")
+ENTRY = struct.Struct("<QI")
+OFFSET = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")
+TABLE = struct.Struct("<IQ")
+NAME = struct.Struct("<H")
+
+
+def key(value) -> bytes:
+    """ Bytes a value is sorted and looked up by in a key table
+    """
+    if type(value) is str:
+        return b"s" + value.encode('utf-8')
+    return b"j" + json.dumps(value).encode('utf-8')
+
+
+def is_snapshot(file_path: str) -> bool:
+    """ Tell if file_path is a snapshot
+    """
+    with open(file_path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_snapshot(file_path: str, records: Iterable[Tuple[str, str]],
+                   attributes: Tuple[str, ...] = ()):
+    """ Atomically write (id, JSON text) records as a snapshot with a key
+        table for the id and for each of attributes
+    """
+    tables = OrderedDict((name, []) for name in ('id',) + tuple(attributes))
+    offsets = []
+    with atomic_writer(file_path) as f:
+        f.write(bytes(HEADER.size))
+        position = HEADER.size
+        for number, (obj_id, text) in enumerate(records):
+            id_bytes, data = obj_id.encode('utf-8'), text.encode('utf-8')
+            offsets.append(position)
+            f.write(RECORD.pack(len(id_bytes), len(data)) + id_bytes + data)
+            position += RECORD.size + len(id_bytes) + len(data)
+            tables['id'].append((key(obj_id), number))
+            if attributes:
+                obj_json = json.loads(text)
+                for attr in attributes:
+                    tables[attr].append((key(obj_json.get(attr)), number))
+        offsets_position = position
+        f.write(struct.pack("<{}Q".format(len(offsets)), *offsets))
+        position += OFFSET.size * len(offsets)
+        directory = []
+        for name, entries in tables.items():
+            entries.sort()
+            directory.append((name, len(entries), position))
+            key_position = position + ENTRY.size * len(entries)
+            packed = bytearray()
+            for value, number in entries:
+                packed += ENTRY.pack(key_position, number)
+                key_position += LENGTH.size + len(value)
+            f.write(packed)
+            f.write(b"".join(LENGTH.pack(len(value)) + value
+                             for value, _ in entries))
+            position = key_position
+        for name, count, entries_position in directory:
+            name = name.encode('utf-8')
+            f.write(NAME.pack(len(name)) + name +
+                    TABLE.pack(count, entries_position))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(tables), len(offsets),
+                            offsets_position, position))
+
+
+class Snapshot():
+    """ Read-only view of a snapshot file
+    """
+
+    def __init__(self, file_path: str):
+        """ Map file_path in memory
+        """
+        with open(file_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, tables, self.count, self._offsets, position = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or not 1 <= version <= VERSION:
+            self._map.close()
+            raise ValueError("{} is not a snapshot".format(file_path))
+        self._null_keys = version >= NULL_KEYS_VERSION
+        self._tables = {}
+        for _ in range(tables):
+            length, = NAME.unpack_from(self._map, position)
+            position += NAME.size
+            name = self._map[position:position + length].decode('utf-8')
+            position += length
+            self._tables[name] = TABLE.unpack_from(self._map, position)
+            position += TABLE.size
+
+    def __len__(self) -> int:
+        """ Number of records
+        """
+        return self.count
+
+    def _position(self, number: int) -> int:
+        """ Position of record number
+        """
+        return OFFSET.unpack_from(self._map,
+                                  self._offsets + OFFSET.size * number)[0]
+
+    def id(self, number: int) -> str:
+        """ Id of record number
+        """
+        position = self._position(number)
+        length, _ = RECORD.unpack_from(self._map, position)
+        position += RECORD.size
+        return self._map[position:position + length].decode('utf-8')
+
+    def record(self, number: int) -> Tuple[str, bytes]:
+        """ Id and JSON text of record number
+        """
+        position = self._position(number)
+        id_length, length = RECORD.unpack_from(self._map, position)
+        position += RECORD.size
+        obj_id = self._map[position:position + id_length].decode('utf-8')
+        position += id_length
+        return obj_id, self._map[position:position + length]
+
+    def _key(self, position: int) -> bytes:
+        """ Key stored at position
+        """
+        length, = LENGTH.unpack_from(self._map, position)
+        position += LENGTH.size
+        return self._map[position:position + length]
+
+    def find(self, name: str, value) -> List[int]:
+        """ Numbers of the records whose name equals value, found by
+            binary search in the key table of name (or by reading every
+            record if there is none, or for None in a version 1 file)
+        """
+        if name not in self._tables or (value is None and
+                                        not self._null_keys):
+            return [number for number in range(self.count)
+                    if json.loads(self.record(number)[1]).get(name) == value]
+        count, entries = self._tables[name]
+        wanted = key(value)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            position, _ = ENTRY.unpack_from(self._map,
+                                            entries + ENTRY.size * middle)
+            if self._key(position) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        numbers = []
+        while low < count:
+            position, number = ENTRY.unpack_from(self._map,
+                                                 entries + ENTRY.size * low)
+            if self._key(position) != wanted:
+                break
+            numbers.append(number)
+            low += 1
+        return numbers
+
+    def close(self):
+        """ Unmap the file
+        """
+        self._map.close()
+
+
+class SnapshotObjects(MutableMapping):
+    """ Mapping id -> object backed by a snapshot: objects are built on
+        first access and held in a bounded LRU cache. Objects stored or
+        deleted after loading are tracked on top of the snapshot until
+        it is rewritten
+    """
+
+    def __init__(self, cls: type, file_path: str, cache_size: int):
+        """ Initialize the store over the snapshot file_path
+        """
+        self.cls = cls
+        self.cache_size = cache_size
+        self._snapshot = Snapshot(file_path)
+        self._pinned = {}
+        self._added = OrderedDict()
+        self._deleted = set()
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _number(self, obj_id: str) -> int:
+        """ Number of the snapshot record of obj_id, None if there is none
+            or if it was deleted
+        """
+        if obj_id in self._deleted or type(obj_id) is not str:
+            return None
+        numbers = self._snapshot.find('id', obj_id)
+        return numbers[0] if numbers else None
+
+    def _build(self, obj_id: str, text: bytes) -> TypeVar('Base'):
+        """ Build the object of a snapshot record through the cache
+        """
+        obj = self._cache.get(obj_id)
+        if obj is not None:
+            self._cache.move_to_end(obj_id)
+            return obj
+        obj = self.cls(**json.loads(text))
+        self._cache[obj_id] = obj
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return obj
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return the object, building it from the snapshot if needed
+        """
+        with self._lock:
+            obj = self._pinned.get(obj_id)
+            if obj is not None:
+                return obj
+            number = self._number(obj_id)
+            if number is None:
+                raise KeyError(obj_id)
+            return self._build(obj_id, self._snapshot.record(number)[1])
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ Tell if there is an object with id obj_id
+        """
+        with self._lock:
+            return obj_id in self._pinned or self._number(obj_id) is not None
+
+    def __setitem__(self, obj_id: str, obj: TypeVar('Base')):
+        """ Store (pin) an object
+        """
+        with self._lock:
+            if obj_id not in self._pinned and self._number(obj_id) is None:
+                self._added[obj_id] = None
+            self._pinned[obj_id] = obj
+            self._cache.pop(obj_id, None)
+
+    def __delitem__(self, obj_id: str):
+        """ Delete an object
+        """
+        with self._lock:
+            if obj_id in self._added:
+                del self._added[obj_id]
+                del self._pinned[obj_id]
+                return
+            if self._number(obj_id) is None:
+                raise KeyError(obj_id)
+            self._deleted.add(obj_id)
+            self._pinned.pop(obj_id, None)
+            self._cache.pop(obj_id, None)
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over the ids, snapshot records first
+        """
+        with self._lock:
+            deleted, added = set(self._deleted), list(self._added)
+        for number in range(self._snapshot.count):
+            obj_id = self._snapshot.id(number)
+            if obj_id not in deleted:
+                yield obj_id
+        yield from added
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return self._snapshot.count - len(self._deleted) + len(self._added)
+
+    def values(self) -> Iterator[TypeVar('Base')]:
+        """ Iterate over the objects, reading the snapshot in order
+        """
+        for obj_id, text in self._records():
+            with self._lock:
+                obj = self._pinned.get(obj_id)
+                if obj is None and text is not None:
+                    obj = self._build(obj_id, text)
+            if obj is not None:
+                yield obj
+
+    def items(self) -> Iterator[Tuple[str, TypeVar('Base')]]:
+        """ Iterate over the (id, object) pairs
+        """
+        for obj in self.values():
+            yield obj.id, obj
+
+    def _records(self) -> Iterator[Tuple[str, bytes]]:
+        """ (id, JSON text) of the current snapshot records, None as text
+            of the objects added since loading
+        """
+        with self._lock:
+            deleted, added = set(self._deleted), list(self._added)
+        for number in range(self._snapshot.count):
+            obj_id, text = self._snapshot.record(number)
+            if obj_id not in deleted:
+                yield obj_id, text
+        for obj_id in added:
+            yield obj_id, None
+
+    def serialized(self) -> Iterator[Tuple[str, str]]:
+        """ (id, JSON text) of every object: records not stored since
+            loading are copied from the snapshot without being built
+        """
+        for obj_id, text in self._records():
+            obj = self._pinned.get(obj_id)
+            if obj is not None:
+                yield obj_id, json.dumps(obj.to_json(True))
+            elif text is not None:
+                yield obj_id, text.decode('utf-8')
+
+    def snapshot_ids(self, attr: str, value) -> List[str]:
+        """ Ids of the snapshot records whose attr equals value, without
+            the objects stored or deleted since loading
+        """
+        with self._lock:
+            ids = (self._snapshot.id(number)
+                   for number in self._snapshot.find(attr, value))
+            return [obj_id for obj_id in ids
+                    if obj_id not in self._pinned and
+                    obj_id not in self._deleted]
+
+    def rebase(self, file_path: str):
+        """ Switch to a rewritten snapshot holding every current object:
+            pinned objects move to the cache
+        """
+        with self._lock:
+            self._snapshot.close()
+            self._snapshot = Snapshot(file_path)
+            self._cache.update(self._pinned)
+            self._pinned = {}
+            self._added = OrderedDict()
+            self._deleted = set()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def close(self):
+        """ Unmap the snapshot
+        """
+        self._snapshot.close()
+
+
+def convert(source: str, target: str, attributes: Tuple[str, ...]):
+    """ Convert a .db_<Class>.json file to a snapshot or back
+    """
+    if is_snapshot(source):
+        snapshot = Snapshot(source)
+        write_records(target, ((obj_id, text.decode('utf-8'))
+                               for obj_id, text in map(snapshot.record,
+                                                       range(len(snapshot)))))
+        snapshot.close()
+        return
+    with open(source, 'r') as f:
+        objs_json = json.load(f)
+    write_snapshot(target, ((obj_id, json.dumps(obj_json))
+                            for obj_id, obj_json in objs_json.items()),
+                   attributes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a .db_<Class>.json file to a snapshot or back")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("-i", "--index", action="append",
+                        help="indexed attribute of the snapshot, can be "
+                             "repeated (default: email)")
+    args = parser.parse_args()
+    convert(args.source, args.target, tuple(args.index or ('email',)))
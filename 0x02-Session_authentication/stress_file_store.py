@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+""" Stress test of the file store shared by several processes: N workers
+    save their own users and race for the same shared emails, with and
+    without STORAGE_MULTIPROCESS, then every write is checked on disk
+    Usage: ./stress_file_store.py [workers] [saves]   (default: 4 500)
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = {
+    "multi-process": {"STORAGE_MULTIPROCESS": "1"},
+    "single-process": {"STORAGE_MULTIPROCESS": "0", "STORAGE_JOURNAL": "0"},
+}
+
+
+def worker(number: int, saves: int, results):
+    """ Saves users, racing the other workers every 10 saves
+        Puts the number of shared emails won, or None if it crashed
+    """
+    won = None
+    try:
+        from models.user import User
+        User.load_from_file()
+        won = 0
+        for i in range(saves):
+            user = User(email="worker{}-{}@hbtn.io".format(number, i))
+            user.save()
+            user.first_name = "updated"
+            user.save()
+            if i % 10 == 0:
+                try:
+                    User(email="shared{}@hbtn.io".format(i)).save()
+                    won += 1
+                except ValueError:
+                    pass
+            if i % 50 == 0:
+                User.search({"email": "worker0-0@hbtn.io"})
+    except Exception as e:
+        print("  worker {} crashed: {!r}".format(number, e), file=sys.stderr)
+        won = None
+    finally:
+        results.put(won)
+
+
+def run(workers: int, saves: int):
+    """ Runs the workers, then checks the store left on disk """
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker,
+                                         args=(n, saves, results))
+                 for n in range(workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    won = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    from models.user import User
+    User.load_from_file()
+    users = User.all()
+    emails = [user.email for user in users]
+    own = sum(1 for user in users
+              if user.email.startswith("worker") and
+              user.first_name == "updated")
+    shared = sum(1 for email in emails if email.startswith("shared"))
+    print("  {:.0f} saves/s, {} crashed workers, {} of {} users kept "
+          "({} lost), {} shared emails won, {} stored, {} duplicates".format(
+              workers * saves * 2 / elapsed, won.count(None), own,
+              workers * saves, workers * saves - own,
+              sum(n for n in won if n is not None), shared,
+              len(emails) - len(set(emails))))
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    saves = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    if len(sys.argv) > 3:
+        run(workers, saves)
+        sys.exit(0)
+    project = os.path.dirname(os.path.abspath(__file__))
+    for name, variables in MODES.items():
+        print("{} ({} workers x {} users):".format(name, workers, saves),
+              flush=True)
+        env = dict(os.environ, PYTHONPATH=project, **variables)
+        subprocess.run([sys.executable, os.path.abspath(__file__),
+                        str(workers), str(saves), "run"], env=env,
+                       check=True, cwd=tempfile.mkdtemp())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+""" Multi-process check of the session backends: workers log users in,
+    then resolve every session, most of them created by another process,
+    then log half of them out and check that every worker rejects those
+    once their cache expired. Users are kept by STORAGE_ENGINE=sqlite so
+    that every process sees them
+    Usage: ./stress_sessions.py [workers] [sessions]   (default: 4, 400)
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BACKENDS = ("memory", "sqlite")
+CACHE_TTL = 0.5
+
+
+def init():
+    """ Load the API in the worker """
+    global client, auth
+    from api.v1.app import app, auth
+    client = app.test_client()
+
+
+def login(emails: list) -> list:
+    """ (session ID, pid) of a login of each email """
+    sessions = []
+    for email in emails:
+        response = client.post("/api/v1/auth_session/login",
+                               data={"email": email, "password": "pwd"})
+        assert response.status_code == 200
+        sessions.append((response.headers["Set-Cookie"].split(";")[0]
+                         .split("=", 1)[1], os.getpid()))
+    return sessions
+
+
+def resolve(sessions: list) -> tuple:
+    """ Number of sessions resolved through GET /api/v1/users/me, how
+        many of them come from another process, and the microseconds of
+        a lookup from the database and from the cache
+    """
+    resolved = foreign = 0
+    lookups = [0.0, 0.0]
+    for session_id, pid in sessions:
+        for i in range(2):
+            start = time.perf_counter()
+            auth.user_id_for_session_id(session_id)
+            lookups[i] += time.perf_counter() - start
+        client.set_cookie("sid", session_id)
+        if client.get("/api/v1/users/me").status_code == 200:
+            resolved += 1
+            foreign += pid != os.getpid()
+    return resolved, foreign, [t / len(sessions) * 1e6 for t in lookups]
+
+
+def logout(sessions: list) -> int:
+    """ Number of sessions logged out """
+    count = 0
+    for session_id, _ in sessions:
+        client.set_cookie("sid", session_id)
+        count += client.delete("/api/v1/auth_session/logout"
+                               ).status_code == 200
+    return count
+
+
+def chunks(items: list, count: int) -> list:
+    """ items split in count lists """
+    return [items[i::count] for i in range(count)]
+
+
+def run(backend: str, workers: int, size: int):
+    """ Runs the check on one backend """
+    os.chdir(tempfile.mkdtemp())
+    os.environ.update(SESSION_BACKEND=backend)
+    from models.user import User
+    emails = ["user{}@hbtn.io".format(i) for i in range(size)]
+    with User.transaction():
+        for email in emails:
+            user = User(email=email)
+            user.password = "pwd"
+            user.save()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init) as pool:
+        sessions = sum(pool.map(login, chunks(emails, workers)), [])
+        # each worker resolves the sessions of the next one
+        results = pool.map(resolve, chunks(sessions[size // workers:] +
+                                           sessions[:size // workers],
+                                           workers))
+        resolved = sum(r[0] for r in results)
+        foreign = sum(r[1] for r in results)
+        lookups = [sum(r[2][i] for r in results) / workers for i in (0, 1)]
+        print("{:>7}: {}/{} sessions resolved, {} made by another process,"
+              " lookup {:.0f} us then {:.0f} us cached".format(
+                  backend, resolved, size, foreign, *lookups))
+        logged_out = sum(pool.map(logout, chunks(sessions[::2], workers)))
+        time.sleep(CACHE_TTL)
+        remaining = sum(r[0] for r in pool.map(resolve,
+                                               chunks(sessions, workers)))
+        print("{:>7}: {} logged out, {}/{} sessions still resolved".format(
+            backend, logged_out, remaining, size))
+    if backend == "sqlite":
+        assert resolved == size and foreign > 0
+        assert logged_out == len(sessions[::2])
+        assert remaining == size - logged_out
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    os.environ.update(AUTH_TYPE="session_auth", SESSION_NAME="sid",
+                      STORAGE_ENGINE="sqlite",
+                      SESSION_CACHE_TTL=str(CACHE_TTL))
+    os.environ["PYTHONPATH"] = os.path.dirname(os.path.abspath(__file__))
+    for backend in BACKENDS:
+        context = multiprocessing.get_context("spawn")
+        process = context.Process(target=run, args=(backend, workers, size))
+        process.start()
+        process.join()
+        assert process.exitcode == 0